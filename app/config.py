@@ -10,8 +10,47 @@ CHANNEL_ID = os.getenv('CHANNEL_ID')
 CHANNEL_USERNAME = os.getenv('CHANNEL_USERNAME')  # e.g., "massfitdenau" or "@massfitdenau"
 CHANNEL_URL = os.getenv('CHANNEL_URL')  # e.g., "https://t.me/massfitdenau"
 DATABASE_URL = os.getenv('DATABASE_URL')
+# Schema handling on startup: 'check' (refuse to start on an outdated schema),
+# 'migrate' (apply pending migrations first) or 'skip' (no schema work at all)
+DB_SCHEMA_MODE = os.getenv('DB_SCHEMA_MODE', 'check').lower()
 # Set to 'false' to disable subscription checking (for testing)
 ENABLE_SUBSCRIPTION_CHECK = os.getenv('ENABLE_SUBSCRIPTION_CHECK', 'true').lower() == 'true'
+# Channel membership cache: max users, seconds to trust "member" and "not a member" answers
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv('SUBSCRIPTION_CACHE_SIZE', '10000'))
+SUBSCRIPTION_CACHE_TTL = float(os.getenv('SUBSCRIPTION_CACHE_TTL', '600'))
+SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv('SUBSCRIPTION_NEGATIVE_TTL', '15'))
+# Seconds before the in-process product catalog is reloaded, so product edits made
+# through another bot replica show up (0 keeps it until a local edit)
+CATALOG_TTL = float(os.getenv('CATALOG_TTL', '60'))
+# Per-update user context cache (tg_id -> id, name, phone): max users, TTL seconds
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))
+# Seconds the admin statistics screens reuse one computed result
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', '30'))
+# Seconds without basket ➕/➖ taps before the basket message is re-rendered
+BASKET_RENDER_DELAY = float(os.getenv('BASKET_RENDER_DELAY', '0.7'))
+# FSM storage: 'memory', 'redis' or 'postgres'; seconds after the last write before an
+# unfinished flow is forgotten (0 keeps it forever); whether an unreachable Redis falls
+# back to per-process memory storage instead of stopping the bot
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'memory').lower()
+FSM_STATE_TTL = float(os.getenv('FSM_STATE_TTL', '86400'))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+FSM_STORAGE_FALLBACK = os.getenv('FSM_STORAGE_FALLBACK', 'false').lower() == 'true'
+# Bot API HTTP client: max simultaneous connections and request timeout (seconds)
+BOT_SESSION_LIMIT = int(os.getenv('BOT_SESSION_LIMIT', '100'))
+BOT_SESSION_TIMEOUT = float(os.getenv('BOT_SESSION_TIMEOUT', '60'))
+# Reverse geocoding: 'nominatim' or 'stub' (offline), cache size/TTL (seconds), coordinate rounding
+GEOCODER_BACKEND = os.getenv('GEOCODER_BACKEND', 'nominatim').lower()
+GEOCODER_CACHE_SIZE = int(os.getenv('GEOCODER_CACHE_SIZE', '1024'))
+GEOCODER_CACHE_TTL = float(os.getenv('GEOCODER_CACHE_TTL', '86400'))
+GEOCODER_PRECISION = int(os.getenv('GEOCODER_PRECISION', '4'))
+# Broadcasts: global messages/second, min seconds between messages to one chat,
+# concurrent senders, recipients per persisted batch, seconds between progress edits
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))
+BROADCAST_CHAT_INTERVAL = float(os.getenv('BROADCAST_CHAT_INTERVAL', '1'))
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', '20'))
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '500'))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))
 
 def is_admin(user_id: int) -> bool:
     """Check if user is admin"""
@@ -0,0 +1,86 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.models import Order, OrderItem, Branch, DailyOrderStats
+
+# Analytics screens cover the last ANALYTICS_DAYS days
+ANALYTICS_DAYS = 30
+
+
+async def get_top_products(session: AsyncSession, order_by: str = 'revenue', limit: int = 10):
+    """Best-selling products of delivered orders: rows of (name, units, revenue).
+
+    Grouped by the product name snapshotted in the order, so renamed or
+    deleted products keep their history.
+    """
+    since = datetime.now() - timedelta(days=ANALYTICS_DAYS)
+    units = func.sum(OrderItem.quantity).label('units')
+    revenue = func.sum(OrderItem.product_price * OrderItem.quantity).label('revenue')
+    result = await session.execute(
+        select(OrderItem.product_name.label('name'), units, revenue)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status == 'delivered', Order.delivered_at >= since)
+        .group_by(OrderItem.product_name)
+        .order_by((units if order_by == 'units' else revenue).desc())
+        .limit(limit)
+    )
+    return result.all()
+
+
+async def get_branch_revenue(session: AsyncSession):
+    """Delivered orders per pickup branch: rows of (branch_id, name, orders, revenue).
+
+    Read from the daily_order_stats rollup; ``branch_id`` 0 collects the
+    orders without a branch (deliveries).
+    """
+    since = date.today() - timedelta(days=ANALYTICS_DAYS - 1)
+    orders = func.sum(DailyOrderStats.order_count).label('orders')
+    revenue = func.sum(DailyOrderStats.revenue).label('revenue')
+    result = await session.execute(
+        select(DailyOrderStats.branch_id, Branch.name, orders, revenue)
+        .outerjoin(Branch, Branch.id == DailyOrderStats.branch_id)
+        .where(DailyOrderStats.status == 'delivered', DailyOrderStats.day >= since)
+        .group_by(DailyOrderStats.branch_id, Branch.name)
+        .order_by(revenue.desc())
+    )
+    return result.all()
+
+
+async def get_delivery_type_split(session: AsyncSession):
+    """Pickup vs delivery from the rollup: rows of (delivery_type, delivered, revenue, cancelled)"""
+    since = date.today() - timedelta(days=ANALYTICS_DAYS - 1)
+    delivered = DailyOrderStats.status == 'delivered'
+    cancelled = DailyOrderStats.status == 'cancelled'
+    result = await session.execute(
+        select(
+            DailyOrderStats.delivery_type,
+            func.coalesce(func.sum(DailyOrderStats.order_count).filter(delivered), 0).label('delivered'),
+            func.coalesce(func.sum(DailyOrderStats.revenue).filter(delivered), 0).label('revenue'),
+            func.coalesce(func.sum(DailyOrderStats.order_count).filter(cancelled), 0).label('cancelled')
+        )
+        .where(DailyOrderStats.day >= since)
+        .group_by(DailyOrderStats.delivery_type)
+        .order_by(DailyOrderStats.delivery_type)
+    )
+    return result.all()
+
+
+async def get_order_heatmap(session: AsyncSession) -> list[list[int]]:
+    """Orders placed per weekday and hour: ``grid[weekday][hour]``, Monday first.
+
+    Buckets ``created_at``, which the bot stamps in its local time like the
+    rest of the statistics.
+    """
+    since = datetime.now() - timedelta(days=ANALYTICS_DAYS)
+    # Day of week 0-6 from Sunday, the same on Postgres and SQLite
+    weekday = extract('dow', Order.created_at)
+    hour = extract('hour', Order.created_at)
+    result = await session.execute(
+        select(weekday, hour, func.count(Order.id))
+        .where(Order.created_at >= since)
+        .group_by(weekday, hour)
+    )
+    grid = [[0] * 24 for _ in range(7)]
+    for day, hour, count in result:
+        grid[(int(day) - 1) % 7][int(hour)] = count
+    return grid
@@ -0,0 +1,44 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.models import BroadcastJob
+
+
+async def create_broadcast_job(session: AsyncSession, admin_chat_id: int, message_data: dict,
+                               total: int, admin_message_id: int = None) -> BroadcastJob:
+    job = BroadcastJob(
+        admin_chat_id=admin_chat_id,
+        admin_message_id=admin_message_id,
+        message_data=message_data,
+        status='running',
+        total=total,
+        sent=0,
+        failed=0
+    )
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def get_running_broadcast_jobs(session: AsyncSession):
+    result = await session.execute(
+        select(BroadcastJob).where(BroadcastJob.status == 'running').order_by(BroadcastJob.id)
+    )
+    return result.scalars().all()
+
+
+async def update_broadcast_progress(session: AsyncSession, job_id: int, last_tg_id: int, sent: int, failed: int):
+    """Persist the cursor and counters after a batch has been fully processed"""
+    await session.execute(
+        update(BroadcastJob)
+        .where(BroadcastJob.id == job_id)
+        .values(last_tg_id=last_tg_id, sent=sent, failed=failed)
+    )
+    await session.commit()
+
+
+async def finish_broadcast_job(session: AsyncSession, job_id: int, status: str = 'done'):
+    await session.execute(
+        update(BroadcastJob).where(BroadcastJob.id == job_id).values(status=status)
+    )
+    await session.commit()
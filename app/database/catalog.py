@@ -0,0 +1,108 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select
+from app.database.engine import async_session_maker
+from app.database.models import Product
+from app.config import CATALOG_TTL
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogProduct:
+    """Read-only copy of a Product row, safe to share between handlers"""
+
+    id: int
+    name: str
+    price: Decimal
+    description: str | None
+    type: str
+    product_image: str | None
+    created_at: datetime
+
+
+class ProductCatalog:
+    """Read-through, in-process cache of the whole product catalog.
+
+    The catalog is small and changes only through the admin product screens,
+    so it is loaded with a single query and kept until ``invalidate`` is
+    called by create_product / update_product / delete_product. ``version``
+    increases on every invalidation and keys caches derived from the catalog
+    (see app/keyboards/inline.py); the rows returned by the getters always
+    belong to the current version.
+
+    ``invalidate`` only reaches this process. With several bot replicas the
+    catalog is also reloaded ``ttl`` seconds after it was loaded, so edits
+    made through another replica show up within ``ttl``; ``version`` only
+    moves when the reloaded rows differ. ``ttl=0`` keeps the catalog until
+    it is invalidated (single process).
+    """
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self.version = 0
+        self._by_id: dict[int, CatalogProduct] | None = None
+        self._by_type: dict[str, tuple[CatalogProduct, ...]] = {}
+        self._all: tuple[CatalogProduct, ...] = ()
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.version += 1
+        self._by_id = None
+        self._by_type = {}
+        self._all = ()
+
+    def _is_fresh(self) -> bool:
+        return self._by_id is not None and (not self.ttl or time.monotonic() < self._expires_at)
+
+    async def _load(self):
+        async with self._lock:
+            while not self._is_fresh():
+                version = self.version
+                async with async_session_maker() as session:
+                    result = await session.execute(
+                        select(
+                            Product.id, Product.name, Product.price, Product.description,
+                            Product.type, Product.product_image, Product.created_at
+                        ).order_by(Product.created_at.asc(), Product.id.asc())
+                    )
+                    products = [CatalogProduct(*row) for row in result]
+                # Invalidated while loading: the rows may be stale, load again
+                if version != self.version:
+                    continue
+                self._expires_at = time.monotonic() + self.ttl
+                products = tuple(products)
+                if self._by_id is not None:
+                    # Periodic reload: a change made by another process is a new version
+                    if products == self._all:
+                        continue
+                    self.version += 1
+
+                grouped: dict[str, list[CatalogProduct]] = {}
+                for product in products:
+                    grouped.setdefault(product.type, []).append(product)
+                self._all = products
+                self._by_type = {product_type: tuple(items) for product_type, items in grouped.items()}
+                self._by_id = {product.id: product for product in products}
+
+    async def get_by_id(self, product_id: int) -> CatalogProduct | None:
+        if not self._is_fresh():
+            await self._load()
+        return self._by_id.get(product_id)
+
+    async def get_by_type(self, product_type: str) -> tuple[CatalogProduct, ...]:
+        """Products of one type, oldest first (same order as get_products_by_type)"""
+        if not self._is_fresh():
+            await self._load()
+        return self._by_type.get(product_type, ())
+
+    async def get_all(self) -> tuple[CatalogProduct, ...]:
+        """Every product, oldest first (same order as get_all_products)"""
+        if not self._is_fresh():
+            await self._load()
+        return self._all
+
+
+catalog = ProductCatalog(ttl=CATALOG_TTL)
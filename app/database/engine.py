@@ -1,6 +1,10 @@
 import os
+import time
+from uuid import uuid4
 from dotenv import load_dotenv, find_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util.queue import AsyncAdaptedQueue, Empty
 
 # Try to load a .env from project root first, fall back to a local .env next to this file
 dotenv_path = find_dotenv()
@@ -25,10 +29,114 @@ elif DATABASE_URL.startswith("postgresql://"):
 # Helpful log line (visible in Railway deploy logs)
 print("DATABASE_URL used for engine:", DATABASE_URL.split("://", 1)[0] + "://...")
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+# Connection pool: size, extra connections under bursts, seconds to wait for a free
+# connection, seconds before a connection is replaced, ping before reuse
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# asyncpg prepared statement cache per connection (0 when running behind pgbouncer),
+# server-side statement timeout in milliseconds (0 disables it), name shown in pg_stat_activity
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "30000"))
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "massfit-bot")
+
+
+class WaitTimingQueue(AsyncAdaptedQueue):
+    """Pool queue that records how long checkouts waited for a free connection.
+
+    Only ``get`` is timed: opening a new connection (a checkout that found no
+    idle one but had room to grow) happens after it and is not waiting.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def get(self, block=True, timeout=None):
+        started = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        except Empty:
+            # Blocking get gave up: the pool raises its TimeoutError
+            if block:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool whose queue records connection wait times (see WaitTimingQueue)"""
+
+    _queue_class = WaitTimingQueue
+
+    @property
+    def wait_stats(self) -> WaitTimingQueue:
+        return self._pool
+
+
+def _connect_args() -> dict:
+    if not DATABASE_URL.startswith("postgresql+asyncpg://"):
+        return {}
+    server_settings = {"application_name": DB_APPLICATION_NAME}
+    if DB_STATEMENT_TIMEOUT > 0:
+        server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT)
+    connect_args = {
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "server_settings": server_settings,
+    }
+    if DB_STATEMENT_CACHE_SIZE == 0:
+        # Behind pgbouncer (transaction pooling) a prepared statement may end up
+        # on another server connection: disable SQLAlchemy's own statement cache
+        # too and give every statement a unique name so names never collide
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    return connect_args
+
+
+engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=InstrumentedPool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args=_connect_args(),
+)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
 
 async def get_session() -> AsyncSession:  # type: ignore
     async with async_session_maker() as session:
         yield session
+
+
+def get_pool_stats() -> dict:
+    """Snapshot of the connection pool (connections in use, overflow, wait times)"""
+    pool = engine.sync_engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+    }
+    if isinstance(pool, InstrumentedPool):
+        waits = pool.wait_stats
+        stats.update(
+            checkouts=waits.checkouts,
+            timeouts=waits.timeouts,
+            avg_wait_ms=waits.total_wait / waits.checkouts * 1000 if waits.checkouts else 0.0,
+            max_wait_ms=waits.max_wait * 1000,
+        )
+    return stats
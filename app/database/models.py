@@ -1,5 +1,5 @@
-from datetime import datetime
-from sqlalchemy import BigInteger, String, Integer, Numeric, Text, DateTime, func, ForeignKey
+from datetime import date, datetime
+from sqlalchemy import BigInteger, String, Integer, Numeric, Text, Date, DateTime, JSON, func, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -7,11 +7,20 @@ class Base(DeclarativeBase):
     pass
 
 
+# Relationships are never loaded implicitly (lazy="raise"): every query in
+# app/database declares the eager loads it needs with options(), so a handler
+# touching an unloaded relationship fails loudly instead of issuing hidden SQL.
+
+
 class AbstractBaseModel(Base):
     __abstract__ = True
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    # Stamped by the bot, like delivered_at/cancelled_at and the daily_order_stats
+    # days, so statistics and analytics bucket every timestamp by the bot's local
+    # clock even when the database runs in another time zone. The server default
+    # only covers rows inserted outside the application.
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
@@ -25,12 +34,16 @@ class User(AbstractBaseModel):
     full_name: Mapped[str] = mapped_column(String(512), nullable=True)
     phone_number: Mapped[str] = mapped_column(String(20), nullable=True)
     
-    orders = relationship("Order", back_populates="user", lazy="selectin")
-    basket_items = relationship("BasketItem", back_populates="user", cascade="all, delete-orphan", lazy="selectin")
+    orders = relationship("Order", back_populates="user", lazy="raise")
+    basket_items = relationship("BasketItem", back_populates="user", cascade="all, delete-orphan", lazy="raise")
 
 
 class Product(AbstractBaseModel):
     __tablename__ = 'products'
+    __table_args__ = (
+        # get_products_by_type: WHERE type = ? ORDER BY created_at
+        Index('ix_products_type_created_at', 'type', 'created_at'),
+    )
     
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
@@ -50,19 +63,27 @@ class Branch(AbstractBaseModel):
 
 class BasketItem(AbstractBaseModel):
     __tablename__ = 'basket_items'
+    __table_args__ = (
+        # One row per product in a basket; also serves lookups by user_id alone
+        UniqueConstraint('user_id', 'product_id', name='uq_basket_items_user_product'),
+    )
     
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     product_id: Mapped[int] = mapped_column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
     
-    user = relationship("User", back_populates="basket_items", lazy="selectin")
-    product = relationship("Product", lazy="selectin")
+    user = relationship("User", back_populates="basket_items", lazy="raise")
+    product = relationship("Product", lazy="raise")
 
 
 class Order(AbstractBaseModel):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Analytics heatmap: WHERE created_at >= ?
+        Index('ix_orders_created_at', 'created_at'),
+    )
     
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     total_price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     status: Mapped[str] = mapped_column(String(50), default='waiting', nullable=False)
     group_message_id: Mapped[int] = mapped_column(Integer, nullable=True)
@@ -71,20 +92,66 @@ class Order(AbstractBaseModel):
     delivery_latitude: Mapped[float] = mapped_column(Numeric(10, 7), nullable=True)
     delivery_longitude: Mapped[float] = mapped_column(Numeric(10, 7), nullable=True)
     delivery_address: Mapped[str] = mapped_column(String(500), nullable=True)
+    # Set by update_order_status when the order reaches the status; unlike
+    # updated_at they never move afterwards, so statistics range over them
+    delivered_at: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)
+    cancelled_at: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)
     
-    user = relationship("User", back_populates="orders", lazy="selectin")
-    branch = relationship("Branch", lazy="selectin")
-    order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", lazy="selectin")
+    user = relationship("User", back_populates="orders", lazy="raise")
+    branch = relationship("Branch", lazy="raise")
+    order_items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", lazy="raise")
 
 
 class OrderItem(AbstractBaseModel):
     __tablename__ = 'order_items'
     
-    order_id: Mapped[int] = mapped_column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
+    order_id: Mapped[int] = mapped_column(Integer, ForeignKey('orders.id', ondelete='CASCADE'), nullable=False, index=True)
     product_id: Mapped[int] = mapped_column(Integer, ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
     product_name: Mapped[str] = mapped_column(String(255), nullable=False)
     product_price: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     
-    order = relationship("Order", back_populates="order_items", lazy="selectin")
-    product = relationship("Product", lazy="selectin")
+    order = relationship("Order", back_populates="order_items", lazy="raise")
+    product = relationship("Product", lazy="raise")
+
+
+class BroadcastJob(AbstractBaseModel):
+    __tablename__ = 'broadcast_jobs'
+    
+    admin_chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    admin_message_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    message_data: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default='running', nullable=False)
+    # Keyset cursor: every recipient with tg_id <= last_tg_id has been processed
+    last_tg_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    sent: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+# Per-day rollup of delivered/cancelled orders, kept in step by update_order_status
+class DailyOrderStats(AbstractBaseModel):
+    __tablename__ = 'daily_order_stats'
+    __table_args__ = (
+        # Upsert target; also serves the statistics range reads (WHERE day >= ?)
+        UniqueConstraint('day', 'status', 'branch_id', 'delivery_type', name='uq_daily_order_stats_bucket'),
+    )
+    
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    status: Mapped[str] = mapped_column(String(50), nullable=False)
+    # 0 / '' instead of NULL so that every bucket is a distinct unique key
+    branch_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    delivery_type: Mapped[str] = mapped_column(String(50), default='', nullable=False)
+    order_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    revenue: Mapped[float] = mapped_column(Numeric(14, 2), default=0, nullable=False)
+
+
+class FSMRecord(AbstractBaseModel):
+    __tablename__ = 'fsm_records'
+    
+    # Storage key built by aiogram's DefaultKeyBuilder (fsm:<chat_id>:<user_id>...)
+    key: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    state: Mapped[str] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # NULL never expires; expired rows are ignored on read and purged periodically
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True, index=True)
@@ -1,69 +1,88 @@
-from sqlalchemy import select, delete
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, delete, insert, update, func, text, literal_column, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
-from app.database.models import BasketItem, Order, OrderItem, User, Product
+from app.database.models import BasketItem, Order, OrderItem, User, Product, DailyOrderStats
+from app.database.stats_cache import stats_cache
+
+# Order statuses counted in the daily_order_stats rollup, with the column
+# recording when an order reached them
+ROLLUP_STATUSES = ('delivered', 'cancelled')
+STATUS_TIMESTAMPS = {'delivered': 'delivered_at', 'cancelled': 'cancelled_at'}
 
 
 # BASKET OPERATIONS
-async def get_basket_items(session: AsyncSession, user_id: int):
+async def get_basket_view(session: AsyncSession, user_id: int):
+    """Everything needed to render a basket, in one statement.
+
+    Returns ``(lines, total)``: ``lines`` are rows of (product_id, quantity,
+    name, price, description, line_total) in the order items were added, and
+    ``total`` is the grand total computed by Postgres as a window sum over the
+    same rows. Prices stay ``Decimal``; an empty basket gives ``([], Decimal(0))``.
+    """
+    line_total = (Product.price * BasketItem.quantity).label('line_total')
     result = await session.execute(
-        select(BasketItem).where(BasketItem.user_id == user_id)
+        select(
+            BasketItem.product_id,
+            BasketItem.quantity,
+            Product.name,
+            Product.price,
+            Product.description,
+            line_total,
+            func.sum(line_total).over().label('total')
+        )
+        .join(Product, Product.id == BasketItem.product_id)
+        .where(BasketItem.user_id == user_id)
+        .order_by(BasketItem.id)
     )
-    return result.scalars().all()
+    lines = result.all()
+    total = lines[0].total if lines else Decimal(0)
+    return lines, total
 
 
 async def add_to_basket(session: AsyncSession, user_id: int, product_id: int, quantity: int = 1):
-    # Check if item already exists
+    """Set the quantity of a product in the basket, inserting the row if needed (one upsert)"""
     result = await session.execute(
-        select(BasketItem).where(
-            BasketItem.user_id == user_id,
-            BasketItem.product_id == product_id
+        pg_insert(BasketItem)
+        .values(user_id=user_id, product_id=product_id, quantity=quantity)
+        .on_conflict_do_update(
+            constraint='uq_basket_items_user_product',
+            set_={'quantity': quantity, 'updated_at': func.now()}
         )
+        .returning(BasketItem)
     )
-    basket_item = result.scalar_one_or_none()
-    
-    if basket_item:
-        basket_item.quantity = quantity
-    else:
-        basket_item = BasketItem(
-            user_id=user_id,
-            product_id=product_id,
-            quantity=quantity
-        )
-        session.add(basket_item)
-    
+    basket_item = result.scalar_one()
     await session.commit()
-    await session.refresh(basket_item)
     return basket_item
 
 
-async def update_basket_quantity(session: AsyncSession, user_id: int, product_id: int, quantity: int):
-    if quantity < 1:
-        # Remove from basket
-        await session.execute(
-            delete(BasketItem).where(
-                BasketItem.user_id == user_id,
-                BasketItem.product_id == product_id
-            )
-        )
-        await session.commit()
-        return None
-    
+async def adjust_basket_quantity(session: AsyncSession, user_id: int, product_id: int, delta: int) -> int | None:
+    """Change a basket line by ``delta`` atomically and return the new quantity.
+
+    ``UPDATE ... SET quantity = quantity + delta RETURNING quantity`` applies
+    the tap to the current row value: a concurrent tap on the same line
+    waits for the row lock and then adds its delta on top, so repeated taps
+    on stale buttons always add up. When the result drops to zero or below
+    the line, still locked by the UPDATE, is deleted in the same
+    transaction. ``None`` is returned when the line was deleted or the
+    product is not in the basket.
+    """
+    where = (BasketItem.user_id == user_id, BasketItem.product_id == product_id)
     result = await session.execute(
-        select(BasketItem).where(
-            BasketItem.user_id == user_id,
-            BasketItem.product_id == product_id
-        )
+        update(BasketItem)
+        .where(*where)
+        .values(quantity=BasketItem.quantity + delta, updated_at=func.now())
+        .returning(BasketItem.quantity)
     )
-    basket_item = result.scalar_one_or_none()
-    
-    if basket_item:
-        basket_item.quantity = quantity
-        await session.commit()
-        await session.refresh(basket_item)
-        return basket_item
-    return None
+    quantity = result.scalar_one_or_none()
+    if quantity is not None and quantity <= 0:
+        await session.execute(delete(BasketItem).where(*where))
+        quantity = None
+    await session.commit()
+    return quantity
 
 
 async def remove_from_basket(session: AsyncSession, user_id: int, product_id: int):
@@ -76,15 +95,37 @@ async def remove_from_basket(session: AsyncSession, user_id: int, product_id: in
     await session.commit()
 
 
-async def clear_basket(session: AsyncSession, user_id: int):
-    await session.execute(delete(BasketItem).where(BasketItem.user_id == user_id))
-    await session.commit()
+# ORDER OPERATIONS
+async def place_order_from_basket(session: AsyncSession, user_id: int, delivery_type: str = None,
+                                  branch_id: int = None, latitude: float = None, longitude: float = None,
+                                  delivery_address: str = None):
+    """Turn the user's basket into an order in a single transaction.
 
+    The basket is snapshotted and emptied by one DELETE ... RETURNING, the order
+    and all of its items are inserted with one statement each, and everything is
+    committed once, so the cost does not grow with the basket size and a failure
+    leaves neither a half-created order nor a lost basket.
 
-# ORDER OPERATIONS
-async def create_order(session: AsyncSession, user_id: int, total_price: float, delivery_type: str = None, 
-                      branch_id: int = None, latitude: float = None, longitude: float = None, 
-                      delivery_address: str = None, group_message_id: int = None):
+    Returns ``(order, lines)`` where ``lines`` are the snapshotted basket rows
+    (product_id, quantity, name, price, description), or
+    ``None`` if the basket was empty.
+    """
+    result = await session.execute(
+        delete(BasketItem)
+        .where(BasketItem.user_id == user_id, BasketItem.product_id == Product.id)
+        .returning(
+            BasketItem.product_id,
+            BasketItem.quantity,
+            Product.name,
+            Product.price,
+            Product.description
+        )
+    )
+    lines = result.all()
+    if not lines:
+        return None
+
+    total_price = sum(line.price * line.quantity for line in lines)
     order = Order(
         user_id=user_id,
         total_price=total_price,
@@ -93,28 +134,26 @@ async def create_order(session: AsyncSession, user_id: int, total_price: float,
         branch_id=branch_id,
         delivery_latitude=latitude,
         delivery_longitude=longitude,
-        delivery_address=delivery_address,
-        group_message_id=group_message_id
+        delivery_address=delivery_address
     )
     session.add(order)
-    await session.commit()
-    await session.refresh(order)
-    return order
+    await session.flush()
 
-
-async def create_order_item(session: AsyncSession, order_id: int, product_id: int, 
-                           product_name: str, product_price: float, quantity: int):
-    order_item = OrderItem(
-        order_id=order_id,
-        product_id=product_id,
-        product_name=product_name,
-        product_price=product_price,
-        quantity=quantity
+    await session.execute(
+        insert(OrderItem),
+        [
+            {
+                'order_id': order.id,
+                'product_id': line.product_id,
+                'product_name': line.name,
+                'product_price': line.price,
+                'quantity': line.quantity
+            }
+            for line in lines
+        ]
     )
-    session.add(order_item)
     await session.commit()
-    await session.refresh(order_item)
-    return order_item
+    return order, lines
 
 
 async def get_order_by_id(session: AsyncSession, order_id: int):
@@ -130,14 +169,105 @@ async def get_user_orders(session: AsyncSession, user_id: int):
 
 
 async def update_order_status(session: AsyncSession, order_id: int, status: str):
-    order = await get_order_by_id(session, order_id)
+    """Set the order status and move the order between daily_order_stats buckets.
+
+    The order row is locked, so two admins tapping the status buttons at once
+    cannot count the same order twice. Cached admin statistics are dropped
+    when the rollup changed.
+    """
+    # The status handler renders the pickup branch, so load it with the order
+    result = await session.execute(
+        select(Order)
+        .options(joinedload(Order.branch))
+        .where(Order.id == order_id)
+        .with_for_update(of=Order)
+    )
+    order = result.scalar_one_or_none()
     if order:
-        order.status = status
+        rollup_changed = order.status != status and (order.status in ROLLUP_STATUSES or status in ROLLUP_STATUSES)
+        if order.status != status:
+            now = datetime.now()
+            reached_at = _status_reached_at(order, order.status)
+            await _update_daily_stats(session, order, [
+                (order.status, reached_at.date() if reached_at else None, -1),
+                (status, now.date(), 1)
+            ])
+            order.status = status
+            if status in STATUS_TIMESTAMPS:
+                setattr(order, STATUS_TIMESTAMPS[status], now)
         await session.commit()
+        if rollup_changed:
+            stats_cache.invalidate()
         await session.refresh(order)
     return order
 
 
+def _status_reached_at(order: Order, status: str) -> datetime | None:
+    column = STATUS_TIMESTAMPS.get(status)
+    return getattr(order, column) if column else None
+
+
+async def _update_daily_stats(session: AsyncSession, order: Order, changes):
+    """Add ``sign`` x order to the (day, status) bucket of each change, in one upsert"""
+    rows = [
+        {
+            'day': day,
+            'status': status,
+            'branch_id': order.branch_id or 0,
+            'delivery_type': order.delivery_type or '',
+            'order_count': sign,
+            'revenue': order.total_price * sign
+        }
+        for status, day, sign in changes
+        if status in ROLLUP_STATUSES and day is not None
+    ]
+    if not rows:
+        return
+    
+    stmt = pg_insert(DailyOrderStats).values(rows)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            constraint='uq_daily_order_stats_bucket',
+            set_={
+                'order_count': DailyOrderStats.order_count + stmt.excluded.order_count,
+                'revenue': DailyOrderStats.revenue + stmt.excluded.revenue,
+                'updated_at': func.now()
+            }
+        )
+    )
+
+
+async def rebuild_daily_order_stats(session: AsyncSession) -> int:
+    """Recompute daily_order_stats from the orders table; returns the number of buckets.
+
+    The rollup table is locked for the rebuild, so status changes made
+    meanwhile wait and are applied on top of the fresh rows. Cached admin
+    statistics are dropped afterwards.
+    """
+    await session.execute(text("LOCK TABLE daily_order_stats IN EXCLUSIVE MODE"))
+    await session.execute(delete(DailyOrderStats))
+    
+    # Literals rather than bound parameters, so GROUP BY matches the selected expressions
+    day = func.date(case(
+        (Order.status == literal_column("'delivered'"), Order.delivered_at),
+        else_=Order.cancelled_at
+    ))
+    branch_id = func.coalesce(Order.branch_id, literal_column('0'))
+    delivery_type = func.coalesce(Order.delivery_type, literal_column("''"))
+    await session.execute(
+        insert(DailyOrderStats).from_select(
+            ['day', 'status', 'branch_id', 'delivery_type', 'order_count', 'revenue'],
+            select(day, Order.status, branch_id, delivery_type, func.count(Order.id), func.sum(Order.total_price))
+            .where(Order.status.in_(ROLLUP_STATUSES), day.is_not(None))
+            .group_by(day, Order.status, branch_id, delivery_type)
+        )
+    )
+    result = await session.execute(select(func.count(DailyOrderStats.id)))
+    await session.commit()
+    stats_cache.invalidate()
+    return result.scalar()
+
+
 async def get_order_items(session: AsyncSession, order_id: int):
     result = await session.execute(
         select(OrderItem).where(OrderItem.order_id == order_id)
@@ -148,12 +278,3 @@ async def get_order_items(session: AsyncSession, order_id: int):
 async def get_user_by_id(session: AsyncSession, user_id: int):
     result = await session.execute(select(User).where(User.id == user_id))
     return result.scalar_one_or_none()
-
-
-async def get_basket_items_with_products(session, user_id: int):
-    result = await session.execute(
-        select(BasketItem)
-        .options(joinedload(BasketItem.product))
-        .where(BasketItem.user_id == user_id)
-    )
-    return result.scalars().all()
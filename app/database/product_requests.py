@@ -1,6 +1,7 @@
 from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.models import Product
+from app.database.catalog import catalog
 
 
 async def get_all_products(session: AsyncSession):
@@ -30,6 +31,7 @@ async def create_product(session: AsyncSession, name: str, price: float, product
     )
     session.add(product)
     await session.commit()
+    catalog.invalidate()
     await session.refresh(product)
     return product
 
@@ -49,6 +51,7 @@ async def update_product(session: AsyncSession, product_id: int, name: str = Non
         if product_image is not None:
             product.product_image = product_image
         await session.commit()
+        catalog.invalidate()
         await session.refresh(product)
     return product
 
@@ -56,4 +59,5 @@ async def update_product(session: AsyncSession, product_id: int, name: str = Non
 async def delete_product(session: AsyncSession, product_id: int) -> bool:
     result = await session.execute(delete(Product).where(Product.id == product_id))
     await session.commit()
+    catalog.invalidate()
     return result.rowcount > 0
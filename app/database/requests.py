@@ -1,7 +1,10 @@
-from sqlalchemy import select, func
+from sqlalchemy import select, func, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.models import User, Order
+from app.database.models import User, DailyOrderStats
+from app.database.user_cache import user_cache
 from datetime import datetime, timedelta
+from decimal import Decimal
 
 
 async def get_user_by_tg_id(session: AsyncSession, tg_id: int) -> User | None:
@@ -22,22 +25,72 @@ async def create_user(session: AsyncSession, tg_id: int, username: str = None,
     )
     session.add(user)
     await session.commit()
+    user_cache.invalidate(tg_id)
     await session.refresh(user)
     return user
 
 
+async def upsert_user(session: AsyncSession, tg_id: int, username: str = None,
+                      first_name: str = None, last_name: str = None, full_name: str = None) -> User:
+    """Register a user or refresh their Telegram profile in one idempotent statement.
+
+    INSERT ... ON CONFLICT (tg_id) DO UPDATE ... RETURNING, so a double-tapped
+    /start cannot hit the unique constraint on users.tg_id. The phone number
+    is never touched here.
+    """
+    profile = {
+        'username': username,
+        'first_name': first_name,
+        'last_name': last_name,
+        'full_name': full_name
+    }
+    result = await session.execute(
+        pg_insert(User)
+        .values(tg_id=tg_id, **profile)
+        .on_conflict_do_update(
+            index_elements=[User.tg_id],
+            set_={**profile, 'updated_at': func.now()}
+        )
+        .returning(User)
+    )
+    user = result.scalar_one()
+    await session.commit()
+    user_cache.invalidate(tg_id)
+    return user
+
+
 async def update_user_phone(session: AsyncSession, tg_id: int, phone_number: str) -> User:
     user = await get_user_by_tg_id(session, tg_id)
     if user:
         user.phone_number = phone_number
         await session.commit()
+        user_cache.invalidate(tg_id)
         await session.refresh(user)
     return user
 
 
-async def get_all_users(session: AsyncSession) -> list[User]:
-    result = await session.execute(select(User))
-    return result.scalars().all()
+async def get_recipient_batch(session: AsyncSession, after_tg_id: int = None, limit: int = 500) -> list[int]:
+    """Get the next batch of user tg_ids in tg_id order (keyset pagination)"""
+    query = select(User.tg_id).order_by(User.tg_id).limit(limit)
+    if after_tg_id is not None:
+        query = query.where(User.tg_id > after_tg_id)
+    result = await session.execute(query)
+    return list(result.scalars().all())
+
+
+async def iter_recipient_batches(session: AsyncSession, batch_size: int = 500, after_tg_id: int = None):
+    """Yield user tg_ids in keyset-paginated batches without loading User objects.
+
+    The read transaction is closed between batches, so a long broadcast does
+    not keep a pooled connection checked out while messages are being sent.
+    """
+    while True:
+        batch = await get_recipient_batch(session, after_tg_id, batch_size)
+        await session.commit()
+        if not batch:
+            return
+        yield batch
+        after_tg_id = batch[-1]
 
 
 # Statistics functions
@@ -47,172 +100,56 @@ async def get_total_users_count(session: AsyncSession) -> int:
     return result.scalar()
 
 
-async def get_weekly_users_stats(session: AsyncSession) -> dict:
-    """Get weekly user statistics"""
-    now = datetime.now()
-    week_ago = now - timedelta(days=7)
-    
-    # Users added in the last week
-    result = await session.execute(
-        select(func.count(User.id)).where(User.created_at >= week_ago)
-    )
-    new_users_this_week = result.scalar()
-    
-    # Users that existed a week ago
-    result = await session.execute(
-        select(func.count(User.id)).where(User.created_at < week_ago)
-    )
-    users_week_ago = result.scalar()
-    
-    return {
-        'new_users_this_week': new_users_this_week,
-        'users_week_ago': users_week_ago
-    }
-
-
-async def get_monthly_users_stats(session: AsyncSession) -> dict:
-    """Get monthly user statistics"""
-    now = datetime.now()
-    month_ago = now - timedelta(days=30)
-    
-    # Users added in the last month
-    result = await session.execute(
-        select(func.count(User.id)).where(User.created_at >= month_ago)
-    )
-    new_users_this_month = result.scalar()
-    
-    return {
-        'new_users_this_month': new_users_this_month
-    }
-
-
-async def get_daily_revenue(session: AsyncSession) -> float:
-    """Get revenue from last 24 hours (delivered orders only)"""
-    now = datetime.now()
-    day_ago = now - timedelta(days=1)
-    
-    result = await session.execute(
-        select(func.sum(Order.total_price)).where(
-            Order.status == 'delivered',
-            Order.updated_at >= day_ago
-        )
-    )
-    revenue = result.scalar()
-    return float(revenue or 0)
-
-
-async def get_weekly_revenue(session: AsyncSession) -> float:
-    """Get revenue from last 7 days (delivered orders only)"""
-    now = datetime.now()
-    week_ago = now - timedelta(days=7)
-    
-    result = await session.execute(
-        select(func.sum(Order.total_price)).where(
-            Order.status == 'delivered',
-            Order.updated_at >= week_ago
-        )
-    )
-    revenue = result.scalar()
-    return float(revenue or 0)
-
-
-async def get_monthly_revenue(session: AsyncSession) -> float:
-    """Get revenue from beginning of current month (delivered orders only)"""
-    now = datetime.now()
-    start_of_month = datetime(now.year, now.month, 1)
-    
-    result = await session.execute(
-        select(func.sum(Order.total_price)).where(
-            Order.status == 'delivered',
-            Order.updated_at >= start_of_month
-        )
-    )
-    revenue = result.scalar()
-    return float(revenue or 0)
-
-
-async def get_daily_cancelled_orders(session: AsyncSession) -> dict:
-    """Get cancelled orders and revenue from last 24 hours"""
-    now = datetime.now()
-    day_ago = now - timedelta(days=1)
-    
-    # Count cancelled orders
-    count_result = await session.execute(
-        select(func.count(Order.id)).where(
-            Order.status == 'cancelled',
-            Order.updated_at >= day_ago
-        )
-    )
-    count = count_result.scalar()
-    
-    # Sum revenue of cancelled orders
-    revenue_result = await session.execute(
-        select(func.sum(Order.total_price)).where(
-            Order.status == 'cancelled',
-            Order.updated_at >= day_ago
-        )
-    )
-    revenue = revenue_result.scalar()
-    
-    return {
-        'count': count,
-        'revenue': float(revenue or 0)
-    }
-
+async def get_statistics(session: AsyncSession) -> dict:
+    """User, revenue and cancellation statistics for every admin screen in one query.
 
-async def get_weekly_cancelled_orders(session: AsyncSession) -> dict:
-    """Get cancelled orders and revenue from last 7 days"""
+    Each number is a ``FILTER (WHERE ...)`` conditional aggregate. Order
+    numbers come from the daily_order_stats rollup (at most a month of
+    small rows), never from the orders table. Revenue counts delivered
+    orders only; periods are today, the last 7 days and the current month
+    (the last 30 days for new users). Revenue stays ``Decimal``, as read
+    from the NUMERIC columns.
+    """
     now = datetime.now()
     week_ago = now - timedelta(days=7)
-    
-    # Count cancelled orders
-    count_result = await session.execute(
-        select(func.count(Order.id)).where(
-            Order.status == 'cancelled',
-            Order.updated_at >= week_ago
-        )
-    )
-    count = count_result.scalar()
-    
-    # Sum revenue of cancelled orders
-    revenue_result = await session.execute(
-        select(func.sum(Order.total_price)).where(
-            Order.status == 'cancelled',
-            Order.updated_at >= week_ago
-        )
-    )
-    revenue = revenue_result.scalar()
-    
-    return {
-        'count': count,
-        'revenue': float(revenue or 0)
-    }
-
-
-async def get_monthly_cancelled_orders(session: AsyncSession) -> dict:
-    """Get cancelled orders and revenue from beginning of current month"""
-    now = datetime.now()
-    start_of_month = datetime(now.year, now.month, 1)
-    
-    # Count cancelled orders
-    count_result = await session.execute(
-        select(func.count(Order.id)).where(
-            Order.status == 'cancelled',
-            Order.updated_at >= start_of_month
-        )
-    )
-    count = count_result.scalar()
-    
-    # Sum revenue of cancelled orders
-    revenue_result = await session.execute(
-        select(func.sum(Order.total_price)).where(
-            Order.status == 'cancelled',
-            Order.updated_at >= start_of_month
-        )
-    )
-    revenue = revenue_result.scalar()
+    month_ago = now - timedelta(days=30)
+    today = now.date()
+    periods = {'day': today, 'week': today - timedelta(days=6), 'month': today.replace(day=1)}
+    
+    users = select(
+        func.count(User.id).label('total_users'),
+        func.count(User.id).filter(User.created_at >= week_ago).label('new_users_this_week'),
+        func.count(User.id).filter(User.created_at < week_ago).label('users_week_ago'),
+        func.count(User.id).filter(User.created_at >= month_ago).label('new_users_this_month')
+    ).subquery()
+    
+    delivered = DailyOrderStats.status == 'delivered'
+    cancelled = DailyOrderStats.status == 'cancelled'
+    order_columns = []
+    for name, since in periods.items():
+        recent = DailyOrderStats.day >= since
+        order_columns += [
+            func.sum(DailyOrderStats.revenue).filter(delivered, recent).label(f'revenue_{name}'),
+            func.sum(DailyOrderStats.order_count).filter(cancelled, recent).label(f'cancelled_count_{name}'),
+            func.sum(DailyOrderStats.revenue).filter(cancelled, recent).label(f'cancelled_revenue_{name}')
+        ]
+    orders = select(*order_columns).where(DailyOrderStats.day >= min(periods.values())).subquery()
+    
+    # Both subqueries return exactly one row
+    result = await session.execute(select(users, orders).join_from(users, orders, true()))
+    row = result.one()
     
     return {
-        'count': count,
-        'revenue': float(revenue or 0)
+        'total_users': row.total_users,
+        'new_users_this_week': row.new_users_this_week,
+        'users_week_ago': row.users_week_ago,
+        'new_users_this_month': row.new_users_this_month,
+        'revenue': {name: row._mapping[f'revenue_{name}'] or Decimal(0) for name in periods},
+        'cancelled': {
+            name: {
+                'count': int(row._mapping[f'cancelled_count_{name}'] or 0),
+                'revenue': row._mapping[f'cancelled_revenue_{name}'] or Decimal(0)
+            }
+            for name in periods
+        }
     }
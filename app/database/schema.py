@@ -0,0 +1,74 @@
+import os
+import logging
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from app.database.engine import engine
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'alembic.ini')
+# Revision matching the tables the bot used to create with Base.metadata.create_all
+BASELINE_REVISION = '0001'
+
+
+def get_alembic_config(connection=None) -> Config:
+    config = Config(ALEMBIC_INI)
+    # Keep the bot's logging setup; env.py would otherwise load alembic.ini's loggers
+    config.attributes['configure_logger'] = False
+    if connection is not None:
+        config.attributes['connection'] = connection
+    return config
+
+
+def get_head_revision() -> str:
+    """Latest revision in migrations/versions (read from disk, no database access)"""
+    return ScriptDirectory.from_config(get_alembic_config()).get_current_head()
+
+
+def _get_current_revision(connection) -> str | None:
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def _upgrade(connection):
+    config = get_alembic_config(connection)
+    if _get_current_revision(connection) is None and inspect(connection).has_table('users'):
+        # Database created before migrations existed: adopt it at the baseline
+        logging.info(f"Existing schema without migration history, stamping {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, 'head')
+
+
+async def get_current_revision() -> str | None:
+    async with engine.connect() as conn:
+        return await conn.run_sync(_get_current_revision)
+
+
+async def migrate():
+    """Apply all pending migrations"""
+    async with engine.begin() as conn:
+        await conn.run_sync(_upgrade)
+    logging.info(f"Database migrated to revision {get_head_revision()}")
+
+
+async def prepare_schema(mode: str):
+    """Prepare the database schema before the bot starts.
+
+    ``migrate`` applies pending migrations, ``check`` only compares the stored
+    revision with the latest one (a single small query) and refuses to start
+    on an outdated schema, ``skip`` does no schema work at all.
+    """
+    if mode == 'skip':
+        return
+    if mode == 'migrate':
+        await migrate()
+        return
+
+    current = await get_current_revision()
+    head = get_head_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}. "
+            f"Run 'alembic upgrade head' or start with --migrate."
+        )
+    logging.info(f"Database schema is up to date (revision {head})")
@@ -0,0 +1,36 @@
+from datetime import datetime
+from app.database.engine import async_session_maker
+from app.database.requests import get_statistics
+from app.utils.ttl_cache import TTLCache
+from app.config import STATS_CACHE_TTL
+
+
+class StatisticsCache:
+    """Short-lived cache of the get_statistics result shared by all admins.
+
+    Admins flip between the statistics screens, which all read the same
+    numbers, so one result is reused for ``ttl`` seconds. Concurrent misses
+    share a single query; ``force`` (the refresh button) skips the cached
+    result but still joins a query already in flight.
+    """
+
+    def __init__(self, ttl: float = 30):
+        self._cache = TTLCache(max_size=1, ttl=ttl)
+
+    async def _load(self) -> dict:
+        async with async_session_maker() as session:
+            stats = await get_statistics(session)
+        stats['computed_at'] = datetime.now()
+        return stats
+
+    async def get(self, force: bool = False) -> dict:
+        return await self._cache.get_or_load('statistics', self._load, force=force)
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+stats_cache = StatisticsCache(ttl=STATS_CACHE_TTL)
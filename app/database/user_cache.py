@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from sqlalchemy import select
+from app.database.engine import async_session_maker
+from app.database.models import User
+from app.utils.ttl_cache import TTLCache
+from app.config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+
+@dataclass(frozen=True, slots=True)
+class UserContext:
+    """The few User columns handlers need, resolved once per update"""
+
+    id: int
+    tg_id: int
+    first_name: str | None
+    full_name: str | None
+    phone_number: str | None
+
+
+class UserCache:
+    """LRU/TTL cache of tg_id -> UserContext in front of the users table.
+
+    Unknown tg_ids are cached too (as ``None``), so unregistered users do not
+    query on every tap. create_user, upsert_user and update_user_phone call
+    ``invalidate`` after their commit, so entries never outlive a write made
+    by this process; a write made through another bot replica is picked up
+    once the entry expires, after at most ``ttl`` seconds.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    async def _load(self, tg_id: int) -> UserContext | None:
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(User.id, User.tg_id, User.first_name, User.full_name, User.phone_number)
+                .where(User.tg_id == tg_id)
+            )
+            row = result.one_or_none()
+        return UserContext(*row) if row else None
+
+    async def get(self, tg_id: int) -> UserContext | None:
+        return await self._cache.get_or_load(tg_id, lambda: self._load(tg_id))
+
+    def invalidate(self, tg_id: int):
+        self._cache.invalidate(tg_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+user_cache = UserCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
@@ -0,0 +1,146 @@
+from aiogram import Router, F
+from aiogram.types import CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from app.database.engine import async_session_maker
+from app.database.analytics_requests import (
+    ANALYTICS_DAYS, get_top_products, get_branch_revenue, get_delivery_type_split, get_order_heatmap
+)
+from app.keyboards.inline import get_analytics_keyboard
+from app.utils.formatters import format_price
+from app.config import is_admin
+
+router = Router()
+
+WEEKDAYS = ("Du", "Se", "Ch", "Pa", "Ju", "Sh", "Ya")
+DELIVERY_TYPES = {'pickup': "🏢 Olib ketish", 'delivery': "🚚 Yetkazib berish"}
+# Heatmap cells from no orders to the busiest hour
+HEAT_LEVELS = "·░▒▓█"
+
+
+async def show_analytics_screen(callback: CallbackQuery, text: str):
+    try:
+        await callback.message.edit_text(text, reply_markup=get_analytics_keyboard())
+    except TelegramBadRequest as e:
+        # The same screen tapped again with unchanged numbers
+        if "message is not modified" not in str(e):
+            raise
+    await callback.answer()
+
+
+@router.callback_query(F.data == "analytics")
+async def show_analytics_menu(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
+        return
+    
+    await show_analytics_screen(
+        callback,
+        "📈 <b>Analitika</b>\n\n"
+        f"So'nggi {ANALYTICS_DAYS} kun bo'yicha hisobotni tanlang:"
+    )
+
+
+@router.callback_query(F.data.in_({"analytics_top_revenue", "analytics_top_units"}))
+async def show_top_products(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
+        return
+    
+    order_by = 'units' if callback.data == "analytics_top_units" else 'revenue'
+    async with async_session_maker() as session:
+        products = await get_top_products(session, order_by=order_by)
+    
+    title = "sotilgan soni" if order_by == 'units' else "daromad"
+    lines = [
+        f"{place}. {product.name} — <b>{product.units}</b> ta, {format_price(product.revenue)} so'm"
+        for place, product in enumerate(products, start=1)
+    ]
+    await show_analytics_screen(
+        callback,
+        f"🏆 <b>Top mahsulotlar ({title} bo'yicha)</b>\n"
+        f"<i>So'nggi {ANALYTICS_DAYS} kun, yetkazilgan buyurtmalar</i>\n\n"
+        + ("\n".join(lines) or "Ma'lumot yo'q.")
+    )
+
+
+@router.callback_query(F.data == "analytics_branches")
+async def show_branch_revenue(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
+        return
+    
+    async with async_session_maker() as session:
+        branches = await get_branch_revenue(session)
+    
+    lines = []
+    for branch in branches:
+        if branch.branch_id == 0:
+            name = "🚚 Filialsiz (yetkazib berish)"
+        else:
+            name = f"🏢 {branch.name or f'#{branch.branch_id} (o‘chirilgan)'}"
+        lines.append(f"{name}: <b>{format_price(branch.revenue)} so'm</b> ({branch.orders} ta buyurtma)")
+    await show_analytics_screen(
+        callback,
+        f"🏢 <b>Filiallar bo'yicha daromad</b>\n"
+        f"<i>So'nggi {ANALYTICS_DAYS} kun, yetkazilgan buyurtmalar</i>\n\n"
+        + ("\n".join(lines) or "Ma'lumot yo'q.")
+    )
+
+
+@router.callback_query(F.data == "analytics_delivery")
+async def show_delivery_split(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
+        return
+    
+    async with async_session_maker() as session:
+        split = await get_delivery_type_split(session)
+    
+    total_revenue = sum(row.revenue for row in split)
+    lines = []
+    for row in split:
+        share = row.revenue / total_revenue * 100 if total_revenue else 0
+        lines.append(
+            f"{DELIVERY_TYPES.get(row.delivery_type, row.delivery_type or 'Nomaʼlum')}\n"
+            f"  ✅ Yetkazilgan: <b>{row.delivered}</b> ta, {format_price(row.revenue)} so'm ({share:.0f}%)\n"
+            f"  ❌ Bekor qilingan: <b>{row.cancelled}</b> ta"
+        )
+    await show_analytics_screen(
+        callback,
+        f"🚚 <b>Olib ketish / Yetkazib berish</b>\n"
+        f"<i>So'nggi {ANALYTICS_DAYS} kun</i>\n\n"
+        + ("\n\n".join(lines) or "Ma'lumot yo'q.")
+    )
+
+
+@router.callback_query(F.data == "analytics_heatmap")
+async def show_order_heatmap(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
+        return
+    
+    async with async_session_maker() as session:
+        grid = await get_order_heatmap(session)
+    
+    busiest = max(max(row) for row in grid)
+    rows = ["   0     6     12    18    "]
+    for weekday, counts in zip(WEEKDAYS, grid):
+        cells = "".join(
+            HEAT_LEVELS[0] if not count else HEAT_LEVELS[1 + (count * (len(HEAT_LEVELS) - 2)) // busiest]
+            for count in counts
+        )
+        rows.append(f"{weekday} {cells}")
+    heatmap = "\n".join(rows)
+    
+    text = (
+        f"🕒 <b>Buyurtmalar vaqti (soat x hafta kuni)</b>\n"
+        f"<i>So'nggi {ANALYTICS_DAYS} kunda berilgan buyurtmalar</i>\n\n"
+        f"<pre>{heatmap}</pre>"
+    )
+    if busiest:
+        weekday, hour = max(
+            ((day, hour) for day in range(7) for hour in range(24)),
+            key=lambda cell: grid[cell[0]][cell[1]]
+        )
+        text += f"\n🔥 Eng gavjum: <b>{WEEKDAYS[weekday]} {hour:02d}:00–{hour + 1:02d}:00</b> ({busiest} ta buyurtma)"
+    await show_analytics_screen(callback, text)
@@ -1,11 +1,11 @@
-import asyncio
-import logging
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from app.database.engine import async_session_maker
-from app.database.requests import get_all_users
+from app.database.requests import get_total_users_count
+from app.database.broadcast_requests import create_broadcast_job
+from app.utils.broadcast import run_broadcast_job, build_progress_text
 from app.keyboards.inline import get_admin_panel_keyboard, get_cancel_keyboard, get_broadcast_confirm_keyboard
 
 router = Router()
@@ -83,7 +83,7 @@ async def process_broadcast_message(message: Message, state: FSMContext):
     
     # Get user count for confirmation
     async with async_session_maker() as session:
-        users = await get_all_users(session)
+        total_users = await get_total_users_count(session)
     
     # Create preview text based on content type
     content_preview = ""
@@ -119,7 +119,7 @@ async def process_broadcast_message(message: Message, state: FSMContext):
         f"📢 <b>Habar tasdiqlash</b>\n\n"
         f"Yuborilgan habar:\n"
         f"{content_preview}\n\n"
-        f"👥 Habar yuboriladi: <b>{len(users)}</b> ta foydalanuvchiga\n\n"
+        f"👥 Habar yuboriladi: <b>{total_users}</b> ta foydalanuvchiga\n\n"
         f"Habar yuborishni tasdiqlaysizmi?"
     )
     
@@ -132,11 +132,10 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     message_data = data['broadcast_message']
     
-    # Get all users
     async with async_session_maker() as session:
-        users = await get_all_users(session)
+        total_users = await get_total_users_count(session)
     
-    if not users:
+    if not total_users:
         await callback.message.edit_text(
             "❌ <b>Foydalanuvchilar topilmadi</b>\n\n"
             "Habar yuborish uchun kamida bitta foydalanuvchi bo'lishi kerak.",
@@ -146,145 +145,21 @@ async def confirm_broadcast(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
     
-    # Show sending progress
-    content_type = message_data.get('content_type', 'text')
-    progress_text = f"📤 <b>Habar yuborilmoqda...</b>\n\nJami foydalanuvchilar: {len(users)}\nTur: {content_type}"
-    
-    await callback.message.edit_text(progress_text)
+    # Show sending progress; the engine keeps editing this message
+    await callback.message.edit_text(build_progress_text(message_data, total_users, 0, 0))
     await callback.answer()
     
-    # Send message to all users
-    successful_sends = 0
-    failed_sends = 0
-    
-    bot = callback.bot
-    
-    for user in users:
-        try:
-            # Create admin header
-            admin_header = "📢 <b>Admin habari</b>\n\n"
-            
-            # Send different types of content
-            if message_data['content_type'] == 'text':
-                await bot.send_message(
-                    chat_id=user.tg_id,
-                    text=f"{admin_header}{message_data['text']}"
-                )
-            elif message_data['content_type'] == 'photo':
-                caption = message_data.get('caption', '')
-                final_caption = f"{admin_header}{caption}" if caption else admin_header.strip()
-                await bot.send_photo(
-                    chat_id=user.tg_id,
-                    photo=message_data['photo'],
-                    caption=final_caption
-                )
-            elif message_data['content_type'] == 'video':
-                caption = message_data.get('caption', '')
-                final_caption = f"{admin_header}{caption}" if caption else admin_header.strip()
-                await bot.send_video(
-                    chat_id=user.tg_id,
-                    video=message_data['video'],
-                    caption=final_caption
-                )
-            elif message_data['content_type'] == 'animation':
-                caption = message_data.get('caption', '')
-                final_caption = f"{admin_header}{caption}" if caption else admin_header.strip()
-                await bot.send_animation(
-                    chat_id=user.tg_id,
-                    animation=message_data['animation'],
-                    caption=final_caption
-                )
-            elif message_data['content_type'] == 'document':
-                caption = message_data.get('caption', '')
-                final_caption = f"{admin_header}{caption}" if caption else admin_header.strip()
-                await bot.send_document(
-                    chat_id=user.tg_id,
-                    document=message_data['document'],
-                    caption=final_caption
-                )
-            elif message_data['content_type'] == 'audio':
-                caption = message_data.get('caption', '')
-                final_caption = f"{admin_header}{caption}" if caption else admin_header.strip()
-                await bot.send_audio(
-                    chat_id=user.tg_id,
-                    audio=message_data['audio'],
-                    caption=final_caption
-                )
-            elif message_data['content_type'] == 'voice':
-                # Send admin header first, then voice
-                await bot.send_message(
-                    chat_id=user.tg_id,
-                    text=admin_header.strip()
-                )
-                await bot.send_voice(
-                    chat_id=user.tg_id,
-                    voice=message_data['voice']
-                )
-            elif message_data['content_type'] == 'video_note':
-                # Send admin header first, then video note
-                await bot.send_message(
-                    chat_id=user.tg_id,
-                    text=admin_header.strip()
-                )
-                await bot.send_video_note(
-                    chat_id=user.tg_id,
-                    video_note=message_data['video_note']
-                )
-            elif message_data['content_type'] == 'sticker':
-                # Send admin header first, then sticker
-                await bot.send_message(
-                    chat_id=user.tg_id,
-                    text=admin_header.strip()
-                )
-                await bot.send_sticker(
-                    chat_id=user.tg_id,
-                    sticker=message_data['sticker']
-                )
-            elif message_data['content_type'] == 'location':
-                # Send admin header first, then location
-                await bot.send_message(
-                    chat_id=user.tg_id,
-                    text=admin_header.strip()
-                )
-                location = message_data['location']
-                await bot.send_location(
-                    chat_id=user.tg_id,
-                    latitude=location['latitude'],
-                    longitude=location['longitude']
-                )
-            elif message_data['content_type'] == 'contact':
-                # Send admin header first, then contact
-                await bot.send_message(
-                    chat_id=user.tg_id,
-                    text=admin_header.strip()
-                )
-                contact = message_data['contact']
-                await bot.send_contact(
-                    chat_id=user.tg_id,
-                    phone_number=contact['phone_number'],
-                    first_name=contact['first_name'],
-                    last_name=contact.get('last_name')
-                )
-            
-            successful_sends += 1
-            
-            # Add small delay to avoid rate limiting
-            await asyncio.sleep(0.05)
-            
-        except Exception as e:
-            failed_sends += 1
-            logging.warning(f"Failed to send message to user {user.tg_id}: {e}")
-    
-    # Show results
-    result_text = (
-        f"✅ <b>Habar yuborish yakunlandi!</b>\n\n"
-        f"📊 Natija:\n"
-        f"• Muvaffaqiyatli yuborildi: {successful_sends}\n"
-        f"• Xatolik yuz berdi: {failed_sends}\n"
-        f"• Jami: {len(users)}"
-    )
+    # Persist the job and send in the background so the handler returns immediately
+    async with async_session_maker() as session:
+        job = await create_broadcast_job(
+            session,
+            admin_chat_id=callback.message.chat.id,
+            admin_message_id=callback.message.message_id,
+            message_data=message_data,
+            total=total_users
+        )
     
-    await callback.message.edit_text(result_text, reply_markup=get_admin_panel_keyboard())
+    run_broadcast_job(callback.bot, job)
     await state.clear()
 
 
@@ -3,6 +3,10 @@ from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from app.keyboards.inline import get_admin_panel_keyboard
+from app.database.engine import async_session_maker, get_pool_stats
+from app.database.user_cache import user_cache
+from app.database.stats_cache import stats_cache
+from app.utils.subscription import subscription_cache
 from app.config import is_admin
 
 router = Router()
@@ -22,6 +26,48 @@ async def cmd_admin(message: Message):
     )
 
 
+@router.message(Command('dbpool'))
+async def cmd_db_pool(message: Message):
+    """Dump database connection pool statistics"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    stats = get_pool_stats()
+    lines = [f"{key}: <b>{round(value, 2) if isinstance(value, float) else value}</b>" for key, value in stats.items()]
+    await message.answer("🗄 <b>DB pool</b>\n\n" + "\n".join(lines))
+
+
+@router.message(Command('cachestats'))
+async def cmd_cache_stats(message: Message):
+    """Dump in-process cache counters"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    caches = {
+        "Obuna": subscription_cache.stats(),
+        "Foydalanuvchilar": user_cache.stats(),
+        "Statistika": stats_cache.stats()
+    }
+    lines = [
+        f"{name}: <b>{stats['hits']}</b> hit / <b>{stats['misses']}</b> miss, {stats['size']} ta yozuv"
+        for name, stats in caches.items()
+    ]
+    await message.answer("🧮 <b>Cache</b>\n\n" + "\n".join(lines))
+
+
+@router.message(Command('rebuildstats'))
+async def cmd_rebuild_stats(message: Message):
+    """Recompute the daily order statistics rollup from the orders table"""
+    from app.database.order_requests import rebuild_daily_order_stats
+    
+    if not is_admin(message.from_user.id):
+        return
+    
+    async with async_session_maker() as session:
+        buckets = await rebuild_daily_order_stats(session)
+    await message.answer(f"📊 Statistika qayta hisoblandi: <b>{buckets}</b> ta kunlik yozuv")
+
+
 @router.callback_query(F.data == "admin_panel")
 async def show_admin_panel(callback: CallbackQuery, state: FSMContext):
     await state.clear()
@@ -4,8 +4,8 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from app.database.engine import async_session_maker
+from app.database.catalog import catalog
 from app.database.product_requests import (
-    get_all_products, 
     get_product_by_id, 
     create_product, 
     update_product, 
@@ -54,8 +54,7 @@ async def handle_products_page(callback: CallbackQuery):
 
 
 async def view_products_page(callback: CallbackQuery, page: int):
-    async with async_session_maker() as session:
-        products = await get_all_products(session)
+    products = await catalog.get_all()
     
     if not products:
         text = (
@@ -73,7 +72,7 @@ async def view_products_page(callback: CallbackQuery, page: int):
             f"Sahifa: {page + 1}/{total_pages}\n"
             "Batafsil ma'lumot olish uchun mahsulotni tanlang:"
         )
-        markup = get_product_list_keyboard(products, page)
+        markup = get_product_list_keyboard(products, page, version=catalog.version)
     
     # Check if current message has photo (no text to edit)
     if callback.message.photo:
@@ -302,8 +301,7 @@ async def handle_edit_page(callback: CallbackQuery):
 
 
 async def edit_products_page(callback: CallbackQuery, page: int):
-    async with async_session_maker() as session:
-        products = await get_all_products(session)
+    products = await catalog.get_all()
     
     if not products:
         text = (
@@ -321,7 +319,7 @@ async def edit_products_page(callback: CallbackQuery, page: int):
             f"Sahifa: {page + 1}/{total_pages}\n"
             "Tahrirlash uchun mahsulotni tanlang:"
         )
-        markup = get_product_edit_keyboard(products, page)
+        markup = get_product_edit_keyboard(products, page, version=catalog.version)
     
     # Check if current message has photo (no text to edit)
     if callback.message.photo:
@@ -635,8 +633,7 @@ async def handle_delete_page(callback: CallbackQuery):
 
 
 async def delete_products_page(callback: CallbackQuery, page: int):
-    async with async_session_maker() as session:
-        products = await get_all_products(session)
+    products = await catalog.get_all()
     
     if not products:
         text = "📦 O'chirish uchun mahsulotlar mavjud emas."
@@ -651,7 +648,7 @@ async def delete_products_page(callback: CallbackQuery, page: int):
             f"Sahifa: {page + 1}/{total_pages}\n"
             "⚠️ O'chirish uchun mahsulotni tanlang:"
         )
-        markup = get_product_delete_keyboard(products, page)
+        markup = get_product_delete_keyboard(products, page, version=catalog.version)
     
     # Check if current message has photo (no text to edit)
     if callback.message.photo:
@@ -1,12 +1,8 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.enums import ParseMode
-from app.database.engine import async_session_maker
-from app.database.requests import (
-    get_total_users_count, get_weekly_users_stats, get_monthly_users_stats,
-    get_daily_revenue, get_weekly_revenue, get_monthly_revenue,
-    get_daily_cancelled_orders, get_weekly_cancelled_orders, get_monthly_cancelled_orders
-)
+from aiogram.exceptions import TelegramBadRequest
+from app.database.stats_cache import stats_cache
 from app.keyboards.inline import (
     get_user_stats_keyboard, get_revenue_stats_keyboard, 
     get_cancelled_orders_stats_keyboard, get_admin_panel_keyboard
@@ -17,6 +13,15 @@ from app.config import is_admin
 router = Router()
 
 
+async def load_statistics(force: bool = False) -> dict:
+    """Every number of the statistics screens (cached for STATS_CACHE_TTL seconds)"""
+    return await stats_cache.get(force=force)
+
+
+def _stamped(text: str, stats: dict) -> str:
+    return f"{text}\n\n🕒 <i>Hisoblangan: {stats['computed_at']:%H:%M:%S}</i>"
+
+
 @router.callback_query(F.data == "user_stats")
 async def show_user_stats_menu(callback: CallbackQuery):
     if not is_admin(callback.from_user.id):
@@ -32,13 +37,13 @@ async def show_user_stats_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "all_users_stats")
-async def show_all_users_stats(callback: CallbackQuery):
+async def show_all_users_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        total_users = await get_total_users_count(session)
+    stats = await load_statistics(force)
+    total_users = stats['total_users']
     
     text = (
         f"👥 <b>Barcha foydalanuvchilar</b>\n\n"
@@ -46,20 +51,19 @@ async def show_all_users_stats(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_user_stats_keyboard()
+        _stamped(text, stats),
+        reply_markup=get_user_stats_keyboard(refresh="all_users_stats")
     )
     await callback.answer()
 
 
 @router.callback_query(F.data == "weekly_users_stats")
-async def show_weekly_users_stats(callback: CallbackQuery):
+async def show_weekly_users_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        weekly_stats = await get_weekly_users_stats(session)
+    weekly_stats = await load_statistics(force)
     
     text = (
         f"📅 <b>Haftalik foydalanuvchilar statistikasi</b>\n\n"
@@ -69,20 +73,19 @@ async def show_weekly_users_stats(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_user_stats_keyboard()
+        _stamped(text, weekly_stats),
+        reply_markup=get_user_stats_keyboard(refresh="weekly_users_stats")
     )
     await callback.answer()
 
 
 @router.callback_query(F.data == "monthly_users_stats")
-async def show_monthly_users_stats(callback: CallbackQuery):
+async def show_monthly_users_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        monthly_stats = await get_monthly_users_stats(session)
+    monthly_stats = await load_statistics(force)
     
     text = (
         f"📆 <b>Oylik foydalanuvchilar statistikasi</b>\n\n"
@@ -90,8 +93,8 @@ async def show_monthly_users_stats(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_user_stats_keyboard()
+        _stamped(text, monthly_stats),
+        reply_markup=get_user_stats_keyboard(refresh="monthly_users_stats")
     )
     await callback.answer()
 
@@ -112,35 +115,35 @@ async def show_revenue_stats_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "daily_revenue_stats")
-async def show_daily_revenue_stats(callback: CallbackQuery):
+async def show_daily_revenue_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        daily_revenue = await get_daily_revenue(session)
+    stats = await load_statistics(force)
+    daily_revenue = stats['revenue']['day']
     
     text = (
         f"📅 <b>1 kunlik daromad</b>\n\n"
-        f"💵 So'nggi 24 soat davridagi daromad: <b>{format_price(daily_revenue)} so'm</b>\n\n"
+        f"💵 Bugungi daromad: <b>{format_price(daily_revenue)} so'm</b>\n\n"
         f"⚠️ <i>Faqat yetkazilgan buyurtmalar hisobga olingan</i>"
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_revenue_stats_keyboard()
+        _stamped(text, stats),
+        reply_markup=get_revenue_stats_keyboard(refresh="daily_revenue_stats")
     )
     await callback.answer()
 
 
 @router.callback_query(F.data == "weekly_revenue_stats")
-async def show_weekly_revenue_stats(callback: CallbackQuery):
+async def show_weekly_revenue_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        weekly_revenue = await get_weekly_revenue(session)
+    stats = await load_statistics(force)
+    weekly_revenue = stats['revenue']['week']
     
     text = (
         f"📊 <b>1 haftalik daromad</b>\n\n"
@@ -149,20 +152,20 @@ async def show_weekly_revenue_stats(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_revenue_stats_keyboard()
+        _stamped(text, stats),
+        reply_markup=get_revenue_stats_keyboard(refresh="weekly_revenue_stats")
     )
     await callback.answer()
 
 
 @router.callback_query(F.data == "monthly_revenue_stats")
-async def show_monthly_revenue_stats(callback: CallbackQuery):
+async def show_monthly_revenue_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        monthly_revenue = await get_monthly_revenue(session)
+    stats = await load_statistics(force)
+    monthly_revenue = stats['revenue']['month']
     
     text = (
         f"📈 <b>1 oylik daromad</b>\n\n"
@@ -171,8 +174,8 @@ async def show_monthly_revenue_stats(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_revenue_stats_keyboard()
+        _stamped(text, stats),
+        reply_markup=get_revenue_stats_keyboard(refresh="monthly_revenue_stats")
     )
     await callback.answer()
 
@@ -192,35 +195,35 @@ async def show_cancelled_orders_stats_menu(callback: CallbackQuery):
 
 
 @router.callback_query(F.data == "daily_cancelled_stats")
-async def show_daily_cancelled_stats(callback: CallbackQuery):
+async def show_daily_cancelled_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        cancelled_stats = await get_daily_cancelled_orders(session)
+    stats = await load_statistics(force)
+    cancelled_stats = stats['cancelled']['day']
     
     text = (
         f"📅 <b>1 kunlik bekor qilingan buyurtmalar</b>\n\n"
-        f"❌ So'nggi 24 soat davomida bekor qilingan: <b>{cancelled_stats['count']}</b> ta buyurtma\n"
+        f"❌ Bugun bekor qilingan: <b>{cancelled_stats['count']}</b> ta buyurtma\n"
         f"💸 Bekor qilingan buyurtmalar umumiy qiymati: <b>{format_price(cancelled_stats['revenue'])} so'm</b>"
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_cancelled_orders_stats_keyboard()
+        _stamped(text, stats),
+        reply_markup=get_cancelled_orders_stats_keyboard(refresh="daily_cancelled_stats")
     )
     await callback.answer()
 
 
 @router.callback_query(F.data == "weekly_cancelled_stats")
-async def show_weekly_cancelled_stats(callback: CallbackQuery):
+async def show_weekly_cancelled_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        cancelled_stats = await get_weekly_cancelled_orders(session)
+    stats = await load_statistics(force)
+    cancelled_stats = stats['cancelled']['week']
     
     text = (
         f"📊 <b>1 haftalik bekor qilingan buyurtmalar</b>\n\n"
@@ -229,20 +232,20 @@ async def show_weekly_cancelled_stats(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_cancelled_orders_stats_keyboard()
+        _stamped(text, stats),
+        reply_markup=get_cancelled_orders_stats_keyboard(refresh="weekly_cancelled_stats")
     )
     await callback.answer()
 
 
 @router.callback_query(F.data == "monthly_cancelled_stats")
-async def show_monthly_cancelled_stats(callback: CallbackQuery):
+async def show_monthly_cancelled_stats(callback: CallbackQuery, force: bool = False):
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
         return
     
-    async with async_session_maker() as session:
-        cancelled_stats = await get_monthly_cancelled_orders(session)
+    stats = await load_statistics(force)
+    cancelled_stats = stats['cancelled']['month']
     
     text = (
         f"📈 <b>1 oylik bekor qilingan buyurtmalar</b>\n\n"
@@ -251,7 +254,41 @@ async def show_monthly_cancelled_stats(callback: CallbackQuery):
     )
     
     await callback.message.edit_text(
-        text,
-        reply_markup=get_cancelled_orders_stats_keyboard()
+        _stamped(text, stats),
+        reply_markup=get_cancelled_orders_stats_keyboard(refresh="monthly_cancelled_stats")
     )
-    await callback.answer()
\ No newline at end of file
+    await callback.answer()
+
+
+# Statistics screens that can be re-rendered with fresh numbers
+STATS_SCREENS = {
+    'all_users_stats': show_all_users_stats,
+    'weekly_users_stats': show_weekly_users_stats,
+    'monthly_users_stats': show_monthly_users_stats,
+    'daily_revenue_stats': show_daily_revenue_stats,
+    'weekly_revenue_stats': show_weekly_revenue_stats,
+    'monthly_revenue_stats': show_monthly_revenue_stats,
+    'daily_cancelled_stats': show_daily_cancelled_stats,
+    'weekly_cancelled_stats': show_weekly_cancelled_stats,
+    'monthly_cancelled_stats': show_monthly_cancelled_stats,
+}
+
+
+@router.callback_query(F.data.startswith("stats_refresh_"))
+async def refresh_stats_screen(callback: CallbackQuery):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔️ Sizda bu amalni bajarish huquqi yo'q.", show_alert=True)
+        return
+    
+    screen = STATS_SCREENS.get(callback.data.removeprefix("stats_refresh_"))
+    if screen is None:
+        await callback.answer()
+        return
+    
+    try:
+        await screen(callback, force=True)
+    except TelegramBadRequest as e:
+        # Recomputed within the same second as the numbers already shown
+        if "message is not modified" not in str(e):
+            raise
+        await callback.answer()
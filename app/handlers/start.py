@@ -1,18 +1,20 @@
 from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.exceptions import TelegramAPIError
 from app.database.engine import async_session_maker
-from app.database.requests import get_user_by_tg_id, create_user, update_user_phone
+from app.database.requests import upsert_user, update_user_phone
 from app.keyboards.reply import get_phone_keyboard, get_main_menu_keyboard
 from app.keyboards.inline import get_admin_panel_keyboard
-from app.config import is_admin, CHANNEL_ID, CHANNEL_USERNAME, CHANNEL_URL, ENABLE_SUBSCRIPTION_CHECK
+from app.middlewares.subscription import setup_subscription_gate
+from app.utils.subscription import check_subscription
+from app.config import is_admin
 import re
-import logging
 
 router = Router()
+# Channel members only, except admins and the "Tekshirish" button itself
+setup_subscription_gate(router)
 
 
 class PhoneStates(StatesGroup):
@@ -40,61 +42,6 @@ def format_uzbekistan_phone(phone: str) -> str:
     return phone
 
 
-async def check_subscription(bot, user_id: int) -> bool:
-    """Check if user is subscribed to the channel"""
-    if not ENABLE_SUBSCRIPTION_CHECK:
-        return True  # Subscription checking is disabled
-        
-    # Determine which identifier to use for subscription check
-    channel_identifier = None
-    if CHANNEL_USERNAME:
-        # Use username (with or without @)
-        channel_identifier = CHANNEL_USERNAME if CHANNEL_USERNAME.startswith('@') else f"@{CHANNEL_USERNAME}"
-    elif CHANNEL_ID:
-        # Fall back to ID if username is not provided
-        channel_identifier = CHANNEL_ID
-    
-    if not channel_identifier:
-        return True  # If no channel identifier is set, allow access
-    
-    try:
-        chat_member = await bot.get_chat_member(channel_identifier, user_id)
-        return chat_member.status in ['creator', 'administrator', 'member']
-    except TelegramAPIError as e:
-        logging.error(f"Error checking subscription for user {user_id} with channel {channel_identifier}: {e}")
-        # Return False to enforce subscription when there's an error
-        # This ensures users must subscribe even if we can't verify
-        return False
-
-
-def get_subscription_keyboard():
-    """Get keyboard for subscription request"""
-    # Determine the channel URL to use
-    if CHANNEL_URL:
-        # Use the full URL if provided
-        channel_url = CHANNEL_URL
-    elif CHANNEL_USERNAME:
-        # Construct URL from username
-        username = CHANNEL_USERNAME.lstrip('@')
-        channel_url = f"https://t.me/{username}"
-    elif CHANNEL_ID and CHANNEL_ID.startswith('-100'):
-        # For channel IDs starting with -100, construct the URL differently
-        channel_identifier = CHANNEL_ID[4:]
-        channel_url = f"https://t.me/c/{channel_identifier}"
-    elif CHANNEL_ID:
-        # If it's a username or different format
-        channel_url = f"https://t.me/{CHANNEL_ID.lstrip('@')}"
-    else:
-        # Default fallback
-        channel_url = "https://t.me/"
-    
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="📢 Kanalga obuna bo'lish", url=channel_url)],
-        [InlineKeyboardButton(text="✅ Tekshirish", callback_data="check_subscription")]
-    ])
-    return keyboard
-
-
 @router.message(Command('start'))
 async def cmd_start(message: Message):
     # Check if user is admin
@@ -107,71 +54,34 @@ async def cmd_start(message: Message):
         )
         return
     
-    # Check subscription for regular users
-    bot = message.bot
-    is_subscribed = await check_subscription(bot, message.from_user.id)
+    # Register the user or refresh their profile (one round trip)
+    full_name = f"{message.from_user.first_name or ''} {message.from_user.last_name or ''}".strip()
+    async with async_session_maker() as session:
+        user = await upsert_user(
+            session,
+            tg_id=message.from_user.id,
+            username=message.from_user.username,
+            first_name=message.from_user.first_name,
+            last_name=message.from_user.last_name,
+            full_name=full_name
+        )
     
-    if not is_subscribed:
+    if not user.phone_number:
+        # New user, or registered without a phone number yet
         await message.answer(
-            "🔒 <b>Botdan foydalanish uchun kanalga obuna bo'ling!</b>\n\n"
-            "Bizning kanalimizga obuna bo'lib, botning barcha imkoniyatlaridan foydalaning.\n\n"
-            "Obuna bo'lgandan keyin \"✅ Tekshirish\" tugmasini bosing.",
-            reply_markup=get_subscription_keyboard()
+            "Assalomu alaykum! Telefon raqamingizni yuboring.\n\n"
+            "📱 Kontakt yuborish tugmasini bosing yoki\n"
+            "✍️ Qo'lda yozish tugmasini bosing.\n\n"
+            "Bu siz bilan bog'lanishimiz uchun kerak.",
+            reply_markup=get_phone_keyboard()
         )
-        return
-    
-    async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, message.from_user.id)
-        
-        if not user:
-            # Create new user
-            full_name = f"{message.from_user.first_name or ''} {message.from_user.last_name or ''}".strip()
-            await create_user(
-                session,
-                tg_id=message.from_user.id,
-                username=message.from_user.username,
-                first_name=message.from_user.first_name,
-                last_name=message.from_user.last_name,
-                full_name=full_name
-            )
-            
-            await message.answer(
-                "Assalomu alaykum! Telefon raqamingizni yuboring.\n\n"
-                "📱 Kontakt yuborish tugmasini bosing yoki\n"
-                "✍️ Qo'lda yozish tugmasini bosing.\n\n"
-                "Bu siz bilan bog'lanishimiz uchun kerak.",
-                reply_markup=get_phone_keyboard()
-            )
-        elif not user.phone_number:
-            # User exists but no phone number
-            await message.answer(
-                "Assalomu alaykum! Telefon raqamingizni yuboring.\n\n"
-                "📱 Kontakt yuborish tugmasini bosing yoki\n"
-                "✍️ Qo'lda yozish tugmasini bosing.\n\n"
-                "Bu siz bilan bog'lanishimiz uchun kerak.",
-                reply_markup=get_phone_keyboard()
-            )
-        else:
-            # User exists with phone number - show main menu
-            await show_main_menu(message)
+    else:
+        # User exists with phone number - show main menu
+        await show_main_menu(message)
 
 
 @router.message(F.text == "✍️ Telefon raqamni yozish")
 async def request_manual_phone(message: Message, state: FSMContext):
-    # Check subscription before allowing manual phone input
-    if not is_admin(message.from_user.id):
-        bot = message.bot
-        is_subscribed = await check_subscription(bot, message.from_user.id)
-        
-        if not is_subscribed:
-            await message.answer(
-                "🔒 <b>Botdan foydalanish uchun kanalga obuna bo'ling!</b>\n\n"
-                "Bizning kanalimizga obuna bo'lib, botning barcha imkoniyatlaridan foydalaning.\n\n"
-                "Obuna bo'lgandan keyin \"✅ Tekshirish\" tugmasini bosing.",
-                reply_markup=get_subscription_keyboard()
-            )
-            return
-    
     await message.answer(
         "✍️ <b>Telefon raqamini kiriting</b>\n\n"
         "Iltimos, telefon raqamingizni +998 XX XXX XXXX formatida kiriting.\n\n"
@@ -183,21 +93,6 @@ async def request_manual_phone(message: Message, state: FSMContext):
 
 @router.message(PhoneStates.waiting_for_phone)
 async def process_manual_phone(message: Message, state: FSMContext):
-    # Check subscription before processing manual phone
-    if not is_admin(message.from_user.id):
-        bot = message.bot
-        is_subscribed = await check_subscription(bot, message.from_user.id)
-        
-        if not is_subscribed:
-            await message.answer(
-                "🔒 <b>Botdan foydalanish uchun kanalga obuna bo'ling!</b>\n\n"
-                "Bizning kanalimizga obuna bo'lib, botning barcha imkoniyatlaridan foydalaning.\n\n"
-                "Obuna bo'lgandan keyin \"✅ Tekshirish\" tugmasini bosing.",
-                reply_markup=get_subscription_keyboard()
-            )
-            await state.clear()
-            return
-    
     phone = message.text.strip()
     
     if not validate_uzbekistan_phone(phone):
@@ -220,20 +115,6 @@ async def process_manual_phone(message: Message, state: FSMContext):
 
 @router.message(F.contact)
 async def process_contact(message: Message, state: FSMContext):
-    # Check subscription before processing contact
-    if not is_admin(message.from_user.id):
-        bot = message.bot
-        is_subscribed = await check_subscription(bot, message.from_user.id)
-        
-        if not is_subscribed:
-            await message.answer(
-                "🔒 <b>Botdan foydalanish uchun kanalga obuna bo'ling!</b>\n\n"
-                "Bizning kanalimizga obuna bo'lib, botning barcha imkoniyatlaridan foydalaning.\n\n"
-                "Obuna bo'lgandan keyin \"✅ Tekshirish\" tugmasini bosing.",
-                reply_markup=get_subscription_keyboard()
-            )
-            return
-    
     phone_number = message.contact.phone_number
     
     # Format the phone number if it's valid
@@ -271,11 +152,12 @@ async def show_main_menu(message: Message):
     )
 
 
-@router.callback_query(F.data == "check_subscription")
+@router.callback_query(F.data == "check_subscription", flags={'skip_subscription': True})
 async def check_subscription_callback(callback: CallbackQuery):
     """Handle subscription check callback"""
     bot = callback.bot
-    is_subscribed = await check_subscription(bot, callback.from_user.id)
+    # The user pressed "Tekshirish" right after subscribing: never trust a cached "no"
+    is_subscribed = await check_subscription(bot, callback.from_user.id, force=True)
     
     if not is_subscribed:
         await callback.answer(
@@ -287,38 +169,27 @@ async def check_subscription_callback(callback: CallbackQuery):
     await callback.answer("✅ Tabriklaymiz! Siz kanalga obuna bo'ldingiz.", show_alert=True)
     await callback.message.delete()
     
-    # Now proceed with the normal start flow
+    # Now proceed with the normal start flow: register or refresh the user (one round trip)
+    full_name = f"{callback.from_user.first_name or ''} {callback.from_user.last_name or ''}".strip()
     async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, callback.from_user.id)
-        
-        if not user:
-            # Create new user
-            full_name = f"{callback.from_user.first_name or ''} {callback.from_user.last_name or ''}".strip()
-            await create_user(
-                session,
-                tg_id=callback.from_user.id,
-                username=callback.from_user.username,
-                first_name=callback.from_user.first_name,
-                last_name=callback.from_user.last_name,
-                full_name=full_name
-            )
-            
-            await callback.message.answer(
-                "Assalomu alaykum! Telefon raqamingizni yuboring.\n\n"
-                "📱 Kontakt yuborish tugmasini bosing yoki\n"
-                "✍️ Qo'lda yozish tugmasini bosing.\n\n"
-                "Bu siz bilan bog'lanishimiz uchun kerak.",
-                reply_markup=get_phone_keyboard()
-            )
-        elif not user.phone_number:
-            # User exists but no phone number
-            await callback.message.answer(
-                "Assalomu alaykum! Telefon raqamingizni yuboring.\n\n"
-                "📱 Kontakt yuborish tugmasini bosing yoki\n"
-                "✍️ Qo'lda yozish tugmasini bosing.\n\n"
-                "Bu siz bilan bog'lanishimiz uchun kerak.",
-                reply_markup=get_phone_keyboard()
-            )
-        else:
-            # User exists with phone number - show main menu
-            await show_main_menu(callback.message)
+        user = await upsert_user(
+            session,
+            tg_id=callback.from_user.id,
+            username=callback.from_user.username,
+            first_name=callback.from_user.first_name,
+            last_name=callback.from_user.last_name,
+            full_name=full_name
+        )
+    
+    if not user.phone_number:
+        # New user, or registered without a phone number yet
+        await callback.message.answer(
+            "Assalomu alaykum! Telefon raqamingizni yuboring.\n\n"
+            "📱 Kontakt yuborish tugmasini bosing yoki\n"
+            "✍️ Qo'lda yozish tugmasini bosing.\n\n"
+            "Bu siz bilan bog'lanishimiz uchun kerak.",
+            reply_markup=get_phone_keyboard()
+        )
+    else:
+        # User exists with phone number - show main menu
+        await show_main_menu(callback.message)
@@ -2,8 +2,14 @@ from aiogram import Router
 from .products import router as products_router
 from .basket import router as basket_router
 from .orders import router as orders_router
+from app.middlewares.subscription import setup_subscription_gate
+from app.middlewares.user_context import setup_user_context
 
 router = Router()
+# Every user-facing handler is for channel members only
+setup_subscription_gate(router)
+# Handlers taking a ``current_user`` argument receive the resolved user
+setup_user_context(router)
 router.include_router(products_router)
 router.include_router(basket_router)
 router.include_router(orders_router)
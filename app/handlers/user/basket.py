@@ -2,7 +2,8 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from app.database.engine import async_session_maker
-from app.database.product_requests import get_product_by_id
+from app.database.user_cache import UserContext
+from app.database.catalog import catalog
 from app.utils.formatters import format_price
 
 router = Router()
@@ -12,8 +13,7 @@ router = Router()
 async def add_to_basket_view(callback: CallbackQuery):
     product_id = int(callback.data.split("_")[2])
     
-    async with async_session_maker() as session:
-        product = await get_product_by_id(session, product_id)
+    product = await catalog.get_by_id(product_id)
     
     if not product:
         await callback.answer("Mahsulot topilmadi!", show_alert=True)
@@ -61,8 +61,7 @@ async def increase_quantity(callback: CallbackQuery):
     current_qty = int(parts[3])
     new_qty = current_qty + 1
     
-    async with async_session_maker() as session:
-        product = await get_product_by_id(session, product_id)
+    product = await catalog.get_by_id(product_id)
     
     if not product:
         await callback.answer("Mahsulot topilmadi!", show_alert=True)
@@ -108,8 +107,7 @@ async def decrease_quantity(callback: CallbackQuery):
     current_qty = int(parts[3])
     new_qty = max(1, current_qty - 1)
     
-    async with async_session_maker() as session:
-        product = await get_product_by_id(session, product_id)
+    product = await catalog.get_by_id(product_id)
     
     if not product:
         await callback.answer("Mahsulot topilmadi!", show_alert=True)
@@ -165,23 +163,20 @@ async def decrease_quantity(callback: CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("save_basket_"))
-async def save_to_basket(callback: CallbackQuery):
-    from app.database.requests import get_user_by_tg_id
+async def save_to_basket(callback: CallbackQuery, current_user: UserContext | None):
     from app.database.order_requests import add_to_basket
     
     parts = callback.data.split("_")
     product_id = int(parts[2])
     quantity = int(parts[3])
     
+    product = await catalog.get_by_id(product_id)
+    if not product or not current_user:
+        await callback.answer("Savatga saqlashda xatolik!", show_alert=True)
+        return
+    
     async with async_session_maker() as session:
-        product = await get_product_by_id(session, product_id)
-        user = await get_user_by_tg_id(session, callback.from_user.id)
-        
-        if not product or not user:
-            await callback.answer("Savatga saqlashda xatolik!", show_alert=True)
-            return
-        
-        await add_to_basket(session, user.id, product_id, quantity)
+        await add_to_basket(session, current_user.id, product_id, quantity)
     
     await callback.answer("✅ Savatga qo'shildi!", show_alert=True)
     
@@ -1,15 +1,21 @@
-from aiogram import Router, F
+from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from app.database.engine import async_session_maker
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut
+from app.database.user_cache import UserContext
 from app.utils.formatters import format_price
+from app.utils.basket_render import render_basket, render_basket_lines
+from app.utils.geocoding import get_address_from_coords
+from app.utils.debounce import Debouncer
+from app.config import BASKET_RENDER_DELAY
 
 router = Router()
+# Rapid ➕/➖ taps on one basket message collapse into a single edit
+basket_render_debouncer = Debouncer(BASKET_RENDER_DELAY)
 
 
 class OrderStates(StatesGroup):
@@ -17,221 +23,94 @@ class OrderStates(StatesGroup):
     waiting_for_text_address = State()
 
 
-def get_address_from_coords(latitude: float, longitude: float) -> str:
-    """Get address name from coordinates using reverse geocoding."""
-    try:
-        geolocator = Nominatim(user_agent="massfit_bot")
-        location = geolocator.reverse(f"{latitude}, {longitude}", language="uz")
-        if location and location.raw.get('address'):
-            addr = location.raw['address']
-            # Build short address from components
-            parts = []
-            
-            # House number and road/street
-            if addr.get('house_number'):
-                parts.append(addr['house_number'])
-            if addr.get('road'):
-                parts.append(addr['road'])
-            elif addr.get('street'):
-                parts.append(addr['street'])
-            
-            # Neighborhood or suburb
-            if addr.get('neighbourhood'):
-                parts.append(addr['neighbourhood'])
-            elif addr.get('suburb'):
-                parts.append(addr['suburb'])
-            
-            # District
-            if addr.get('city_district'):
-                parts.append(addr['city_district'])
-            
-            if parts:
-                return ", ".join(parts)
-            return location.address
-        return "Manzil aniqlanmadi"
-    except GeocoderTimedOut:
-        return "Manzil aniqlanmadi (timeout)"
-    except Exception:
-        return "Manzil aniqlanmadi"
-
-
 @router.message(F.text == "📦 Mening buyurtmalarim")
-async def my_orders(message: Message):
-    from app.database.requests import get_user_by_tg_id
-    from app.database.order_requests import get_basket_items
+async def my_orders(message: Message, current_user: UserContext | None):
+    from app.database.order_requests import get_basket_view
+    
+    if not current_user:
+        await message.answer("Foydalanuvchi topilmadi!")
+        return
     
     async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, message.from_user.id)
-        
-        if not user:
-            await message.answer("Foydalanuvchi topilmadi!")
-            return
-        
-        basket_items = await get_basket_items(session, user.id)
-        
-        if not basket_items:
-            await message.answer(
-                "🛒 <b>Mening savatim</b>\n\n"
-                "Savatingiz bo'sh.\n"
-                "Buyurtma yaratish uchun mahsulotlarni savatga qo'shing!"
-            )
-            return
-        
-        # Calculate total
-        total = 0
-        items_text = ""
-        
-        for item in basket_items:
-            product = item.product
-            item_total = float(product.price) * item.quantity
-            total += item_total
-
-            description = product.description if hasattr(product, "description") and product.description else ""
-            items_text += (
-                f"• {product.name}\n"
-                f"  📝 {description}\n"
-                f"  💰 {format_price(product.price)} so'm x {item.quantity} = {format_price(item_total)} so'm\n\n"
-            )
-        
-        text = (
-            f"🛒 <b>Mening savatim</b>\n\n"
-            f"{items_text}"
-            f"━━━━━━━━━━━━━━━\n"
-            f"💵 <b>Jami: {format_price(total)} so'm</b>"
+        basket_items, total = await get_basket_view(session, current_user.id)
+
+    if not basket_items:
+        await message.answer(
+            "🛒 <b>Mening savatim</b>\n\n"
+            "Savatingiz bo'sh.\n"
+            "Buyurtma yaratish uchun mahsulotlarni savatga qo'shing!"
         )
-        
-        keyboard = []
-        for item in basket_items:
-            keyboard.append([
-                InlineKeyboardButton(text="➖", callback_data=f"basket_dec_{item.product_id}_{item.quantity}"),
-                InlineKeyboardButton(text=f"{item.quantity}", callback_data="basket_display"),
-                InlineKeyboardButton(text="➕", callback_data=f"basket_inc_{item.product_id}_{item.quantity}")
-            ])
-        
-        keyboard.append([InlineKeyboardButton(text="✅ Buyurtmani tasdiqlash", callback_data="confirm_order_prompt")])
-        
-        await message.answer(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
+        return
+
+    text, markup = render_basket(basket_items, total)
+    await message.answer(text, reply_markup=markup)
+
+
+async def refresh_basket_message(message: Message, user_id: int):
+    """Re-render the basket into an existing message"""
+    from app.database.order_requests import get_basket_view
+    
+    async with async_session_maker() as session:
+        basket_items, total = await get_basket_view(session, user_id)
+    
+    text, markup = render_basket(basket_items, total)
+    
+    try:
+        await message.edit_text(text, reply_markup=markup)
+    except TelegramBadRequest as e:
+        # Taps that cancel out (➕ then ➖) leave the basket as it is shown
+        if "message is not modified" not in str(e):
+            raise
+
+
+def schedule_basket_refresh(message: Message, user_id: int):
+    """Re-render the basket once the user stops tapping ➕/➖"""
+    basket_render_debouncer.schedule(
+        (message.chat.id, message.message_id),
+        lambda: refresh_basket_message(message, user_id)
+    )
+
+
+async def cancel_basket_refresh(message: Message):
+    """Drop a pending basket re-render before ``message`` is edited into another screen"""
+    await basket_render_debouncer.cancel((message.chat.id, message.message_id))
 
 
 @router.callback_query(F.data.startswith("basket_inc_"))
-async def basket_increase(callback: CallbackQuery):
-    from app.database.requests import get_user_by_tg_id
-    from app.database.order_requests import update_basket_quantity, get_basket_items
+async def basket_increase(callback: CallbackQuery, current_user: UserContext | None):
+    from app.database.order_requests import adjust_basket_quantity
     
-    parts = callback.data.split("_")
-    product_id = int(parts[2])
-    current_qty = int(parts[3])
-    new_qty = current_qty + 1
+    # The quantity in callback_data may be stale after fast taps, so only the product id is used
+    product_id = int(callback.data.split("_")[2])
     
+    # Apply the change now, render it when the taps stop
     async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, callback.from_user.id)
-        await update_basket_quantity(session, user.id, product_id, new_qty)
-        
-        basket_items = await get_basket_items(session, user.id)
-        
-        # Recalculate total
-        total = 0
-        items_text = ""
-        
-        for item in basket_items:
-            product = item.product
-            item_total = float(product.price) * item.quantity
-            total += item_total
-
-            description = product.description if hasattr(product, "description") and product.description else ""
-            items_text += (
-                f"• {product.name}\n"
-                f"  📝 {description}\n"
-                f"  💰 {format_price(product.price)} so'm x {item.quantity} = {format_price(item_total)} so'm\n\n"
-            )
-        
-        text = (
-            f"🛒 <b>Mening savatim</b>\n\n"
-            f"{items_text}"
-            f"━━━━━━━━━━━━━━━\n"
-            f"💵 <b>Jami: {format_price(total)} so'm</b>"
-        )
-        
-        keyboard = []
-        for item in basket_items:
-            keyboard.append([
-                InlineKeyboardButton(text="➖", callback_data=f"basket_dec_{item.product_id}_{item.quantity}"),
-                InlineKeyboardButton(text=f"{item.quantity}", callback_data="basket_display"),
-                InlineKeyboardButton(text="➕", callback_data=f"basket_inc_{item.product_id}_{item.quantity}")
-            ])
-        
-        keyboard.append([InlineKeyboardButton(text="✅ Buyurtmani tasdiqlash", callback_data="confirm_order_prompt")])
-        
-        await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
+        await adjust_basket_quantity(session, current_user.id, product_id, 1)
     
     await callback.answer()
+    schedule_basket_refresh(callback.message, current_user.id)
 
 
 @router.callback_query(F.data.startswith("basket_dec_"))
-async def basket_decrease(callback: CallbackQuery):
-    from app.database.requests import get_user_by_tg_id
-    from app.database.order_requests import update_basket_quantity, get_basket_items
+async def basket_decrease(callback: CallbackQuery, current_user: UserContext | None):
+    from app.database.order_requests import adjust_basket_quantity
     
-    parts = callback.data.split("_")
-    product_id = int(parts[2])
-    current_qty = int(parts[3])
-    new_qty = max(0, current_qty - 1)
+    # The quantity in callback_data may be stale after fast taps, so only the product id is used
+    product_id = int(callback.data.split("_")[2])
     
+    # Apply the change now, render it when the taps stop
     async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, callback.from_user.id)
-        await update_basket_quantity(session, user.id, product_id, new_qty)
-        
-        basket_items = await get_basket_items(session, user.id)
-        
-        if not basket_items:
-            await callback.message.edit_text(
-                "🛒 <b>Mening savatim</b>\n\n"
-                "Savat bo'sh.\n"
-                "Buyurtma yaratish uchun mahsulotlarni savatga qo'shing!"
-            )
-            await callback.answer()
-            return
-        
-        # Recalculate total
-        total = 0
-        items_text = ""
-        
-        for item in basket_items:
-            product = item.product
-            item_total = float(product.price) * item.quantity
-            total += item_total
-
-            description = product.description if hasattr(product, "description") and product.description else ""
-            items_text += (
-                f"• {product.name}\n"
-                f"  📝 {description}\n"
-                f"  💰 {format_price(product.price)} so'm x {item.quantity} = {format_price(item_total)} so'm\n\n"
-            )
-        
-        text = (
-            f"🛒 <b>Mening savatim</b>\n\n"
-            f"{items_text}"
-            f"━━━━━━━━━━━━━━━\n"
-            f"💵 <b>Jami: {format_price(total)} so'm</b>"
-        )
-        
-        keyboard = []
-        for item in basket_items:
-            keyboard.append([
-                InlineKeyboardButton(text="➖", callback_data=f"basket_dec_{item.product_id}_{item.quantity}"),
-                InlineKeyboardButton(text=f"{item.quantity}", callback_data="basket_display"),
-                InlineKeyboardButton(text="➕", callback_data=f"basket_inc_{item.product_id}_{item.quantity}")
-            ])
-        
-        keyboard.append([InlineKeyboardButton(text="✅ Buyurtmani tasdiqlash", callback_data="confirm_order_prompt")])
-        
-        await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
+        await adjust_basket_quantity(session, current_user.id, product_id, -1)
     
     await callback.answer()
+    schedule_basket_refresh(callback.message, current_user.id)
 
 
 @router.callback_query(F.data == "confirm_order_prompt")
 async def confirm_order_prompt(callback: CallbackQuery):
+    # A late ➕/➖ render would put the basket back over the delivery choice
+    await cancel_basket_refresh(callback.message)
+    
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
@@ -251,6 +130,8 @@ async def confirm_order_prompt(callback: CallbackQuery):
 
 @router.callback_query(F.data == "order_delivery")
 async def order_delivery_request_location(callback: CallbackQuery, state: FSMContext):
+    await cancel_basket_refresh(callback.message)
+    
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="📍 Joylashuv yuborish", callback_data="delivery_location")],
@@ -272,6 +153,8 @@ async def order_delivery_request_location(callback: CallbackQuery, state: FSMCon
 async def request_location_coords(callback: CallbackQuery, state: FSMContext):
     from app.keyboards.reply import get_location_request_keyboard
     
+    await cancel_basket_refresh(callback.message)
+    
     await callback.message.edit_text(
         "📍 <b>Joylashuvni yuborish</b>\n\n"
         "Iltimos, quyidagi tugmani bosing va joylashuvingizni yuboring."
@@ -289,6 +172,8 @@ async def request_location_coords(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "delivery_text")
 async def request_text_address(callback: CallbackQuery, state: FSMContext):
+    await cancel_basket_refresh(callback.message)
+    
     await callback.message.edit_text(
         "✍️ <b>Manzilni yozish</b>\n\n"
         "Iltimos, yetkazib berish manzilini matn ko'rinishida yozing.\n\n"
@@ -349,7 +234,7 @@ async def process_delivery_location(message: Message, state: FSMContext):
     longitude = message.location.longitude
     
     # Get address from coordinates
-    address = get_address_from_coords(latitude, longitude)
+    address = await get_address_from_coords(latitude, longitude)
     
     await state.update_data(
         delivery_type='delivery',
@@ -397,6 +282,8 @@ async def handle_invalid_location_input(message: Message):
 async def order_pickup_show_branches(callback: CallbackQuery):
     from app.database.branch_requests import get_all_branches
     
+    await cancel_basket_refresh(callback.message)
+    
     async with async_session_maker() as session:
         branches = await get_all_branches(session)
     
@@ -466,113 +353,46 @@ async def confirm_pickup_branch(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "confirm_order_no")
-async def confirm_order_no(callback: CallbackQuery, state: FSMContext):
-    from app.database.requests import get_user_by_tg_id
-    from app.database.order_requests import get_basket_items
+async def confirm_order_no(callback: CallbackQuery, state: FSMContext, current_user: UserContext | None):
+    from app.database.order_requests import get_basket_view
+    
+    await cancel_basket_refresh(callback.message)
     
     async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, callback.from_user.id)
-        basket_items = await get_basket_items(session, user.id)
-        
-        # Recalculate total
-        total = 0
-        items_text = ""
-        
-        for item in basket_items:
-            product = item.product
-            item_total = float(product.price) * item.quantity
-            total += item_total
-
-            description = product.description if hasattr(product, "description") and product.description else ""
-            items_text += (
-                f"• {product.name}\n"
-                f"  📝 {description}\n"
-                f"  💰 {format_price(product.price)} so'm x {item.quantity} = {format_price(item_total)} so'm\n\n"
-            )
-        
-        text = (
-            f"🛒 <b>Mening savatim</b>\n\n"
-            f"{items_text}"
-            f"━━━━━━━━━━━━━━━\n"
-            f"💵 <b>Jami: {format_price(total)} so'm</b>"
-        )
-        
-        keyboard = []
-        for item in basket_items:
-            keyboard.append([
-                InlineKeyboardButton(text="➖", callback_data=f"basket_dec_{item.product_id}_{item.quantity}"),
-                InlineKeyboardButton(text=f"{item.quantity}", callback_data="basket_display"),
-                InlineKeyboardButton(text="➕", callback_data=f"basket_inc_{item.product_id}_{item.quantity}")
-            ])
-        
-        keyboard.append([InlineKeyboardButton(text="✅ Buyurtmani tasdiqlash", callback_data="confirm_order_prompt")])
-        
-        await callback.message.edit_text(text, reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard))
+        basket_items, total = await get_basket_view(session, current_user.id)
+    
+    text, markup = render_basket(basket_items, total)
+    await callback.message.edit_text(text, reply_markup=markup)
     
     await state.clear()
     await callback.answer()
 
 
 @router.callback_query(F.data == "confirm_order_yes_delivery")
-async def confirm_order_yes_delivery(callback: CallbackQuery, state: FSMContext):
-    from app.database.requests import get_user_by_tg_id
-    from app.database.order_requests import (
-        get_basket_items, 
-        create_order, 
-        create_order_item, 
-        clear_basket
-    )
-    from app.config import GROUP_ID, BOT_TOKEN
-    from aiogram import Bot
+async def confirm_order_yes_delivery(callback: CallbackQuery, state: FSMContext, bot: Bot, current_user: UserContext | None):
+    from app.database.order_requests import place_order_from_basket
+    from app.config import GROUP_ID
     
-    bot = Bot(token=BOT_TOKEN)
     data = await state.get_data()
     
     async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, callback.from_user.id)
-        basket_items = await get_basket_items(session, user.id)
-        
-        if not basket_items:
-            await callback.answer("Savatingiz bo'sh!", show_alert=True)
-            return
-        
-        # Calculate total
-        total = 0
-        items_text = ""
-        
-        for item in basket_items:
-            product = item.product
-            item_total = float(product.price) * item.quantity
-            total += item_total
-
-            description = product.description if hasattr(product, "description") and product.description else ""
-            items_text += (
-                f"• {product.name}\n"
-                f"  📝 {description}\n"
-                f"  💰 {format_price(product.price)} so'm x {item.quantity} = {format_price(item_total)} so'm\n\n"
-            )
-        
-        # Create order with delivery details
-        order = await create_order(
-            session, 
-            user.id, 
-            total,
+        # Create order with delivery details from the basket (one transaction)
+        placed = await place_order_from_basket(
+            session,
+            current_user.id,
             delivery_type='delivery',
             latitude=data.get('latitude'),
             longitude=data.get('longitude'),
             delivery_address=data.get('address')
         )
         
-        # Create order items
-        for item in basket_items:
-            await create_order_item(
-                session,
-                order.id,
-                item.product_id,
-                item.product.name,
-                float(item.product.price),
-                item.quantity
-            )
+        if not placed:
+            await callback.answer("Savatingiz bo'sh!", show_alert=True)
+            return
+        
+        order, order_lines = placed
+        total = order.total_price
+        items_text = render_basket_lines(order_lines)
         
         # Send to group with delivery location
         address_info = ""
@@ -587,9 +407,9 @@ async def confirm_order_yes_delivery(callback: CallbackQuery, state: FSMContext)
         
         group_text = (
             f"🆕 <b>Yangi Buyurtma #{order.id}</b>\n\n"
-            f"👤 Mijoz: {user.full_name or user.first_name}\n"
-            f"📱 Telefon: {user.phone_number or 'Berilmagan'}\n"
-            f"🆔 Foydalanuvchi ID: {user.tg_id}\n"
+            f"👤 Mijoz: {current_user.full_name or current_user.first_name}\n"
+            f"📱 Telefon: {current_user.phone_number or 'Berilmagan'}\n"
+            f"🆔 Foydalanuvchi ID: {current_user.tg_id}\n"
             f"🚚 Yetkazib berish turi: <b>Yetkazib berish</b>\n"
             f"{address_info}\n"
             f"📦 <b>Buyurtma mahsulotlari:</b>\n"
@@ -633,9 +453,6 @@ async def confirm_order_yes_delivery(callback: CallbackQuery, state: FSMContext)
             await session.commit()
         except Exception as e:
             print(f"Error sending to group: {e}")
-        
-        # Clear basket
-        await clear_basket(session, user.id)
     
     await callback.message.edit_text(
         f"✅ <b>Buyurtma muvaffaqiyatli qabul qilindi!</b>\n\n"
@@ -647,77 +464,42 @@ async def confirm_order_yes_delivery(callback: CallbackQuery, state: FSMContext)
     )
     await state.clear()
     await callback.answer()
-    await bot.session.close()
 
 
 @router.callback_query(F.data == "confirm_order_yes_pickup")
-async def confirm_order_yes_pickup(callback: CallbackQuery, state: FSMContext):
-    from app.database.requests import get_user_by_tg_id
-    from app.database.order_requests import (
-        get_basket_items, 
-        create_order, 
-        create_order_item, 
-        clear_basket
-    )
+async def confirm_order_yes_pickup(callback: CallbackQuery, state: FSMContext, bot: Bot, current_user: UserContext | None):
+    from app.database.order_requests import place_order_from_basket
     from app.database.branch_requests import get_branch_by_id
-    from app.config import GROUP_ID, BOT_TOKEN
-    from aiogram import Bot
+    from app.config import GROUP_ID
     
-    bot = Bot(token=BOT_TOKEN)
     data = await state.get_data()
     branch_id = data.get('branch_id')
     
     async with async_session_maker() as session:
-        user = await get_user_by_tg_id(session, callback.from_user.id)
-        basket_items = await get_basket_items(session, user.id)
         branch = await get_branch_by_id(session, branch_id)
         
-        if not basket_items:
-            await callback.answer("Savatingiz bo'sh!", show_alert=True)
-            return
-        
-        # Calculate total
-        total = 0
-        items_text = ""
-        
-        for item in basket_items:
-            product = item.product
-            item_total = float(product.price) * item.quantity
-            total += item_total
-
-            description = product.description if hasattr(product, "description") and product.description else ""
-            items_text += (
-                f"• {product.name}\n"
-                f"  📝 {description}\n"
-                f"  💰 {format_price(product.price)} so'm x {item.quantity} = {format_price(item_total)} so'm\n\n"
-            )
-        
-        # Create order with pickup details
-        order = await create_order(
-            session, 
-            user.id, 
-            total,
+        # Create order with pickup details from the basket (one transaction)
+        placed = await place_order_from_basket(
+            session,
+            current_user.id,
             delivery_type='pickup',
             branch_id=branch_id
         )
         
-        # Create order items
-        for item in basket_items:
-            await create_order_item(
-                session,
-                order.id,
-                item.product_id,
-                item.product.name,
-                float(item.product.price),
-                item.quantity
-            )
+        if not placed:
+            await callback.answer("Savatingiz bo'sh!", show_alert=True)
+            return
+        
+        order, order_lines = placed
+        total = order.total_price
+        items_text = render_basket_lines(order_lines)
         
         # Send to group with branch info
         group_text = (
             f"🆕 <b>Yangi Buyurtma #{order.id}</b>\n\n"
-            f"👤 Mijoz: {user.full_name or user.first_name}\n"
-            f"📱 Telefon: {user.phone_number or 'Berilmagan'}\n"
-            f"🆔 Foydalanuvchi ID: {user.tg_id}\n"
+            f"👤 Mijoz: {current_user.full_name or current_user.first_name}\n"
+            f"📱 Telefon: {current_user.phone_number or 'Berilmagan'}\n"
+            f"🆔 Foydalanuvchi ID: {current_user.tg_id}\n"
             f"🏢 Olib ketish filiali: <b>{branch.name}</b>\n"
             f"📍 Filial manzili: {branch.location}\n\n"
             f"📦 <b>Buyurtma mahsulotlari:</b>\n"
@@ -749,9 +531,6 @@ async def confirm_order_yes_pickup(callback: CallbackQuery, state: FSMContext):
             await session.commit()
         except Exception as e:
             print(f"Error sending to group: {e}")
-        
-        # Clear basket
-        await clear_basket(session, user.id)
     
     await callback.message.edit_text(
         f"✅ <b>Buyurtma tasdiqlandi!</b>\n\n"
@@ -763,21 +542,15 @@ async def confirm_order_yes_pickup(callback: CallbackQuery, state: FSMContext):
     )
     await state.clear()
     await callback.answer()
-    await bot.session.close()
 
 
 @router.callback_query(F.data.startswith("order_status_"))
-async def update_order_status_handler(callback: CallbackQuery):
+async def update_order_status_handler(callback: CallbackQuery, bot: Bot):
     from app.database.order_requests import update_order_status, get_order_by_id, get_order_items, get_user_by_id
-    from app.config import BOT_TOKEN
-    from aiogram import Bot
-    
     parts = callback.data.split("_")
     order_id = int(parts[2])
     new_status = parts[3]
     
-    bot = Bot(token=BOT_TOKEN)
-    
     async with async_session_maker() as session:
         order = await update_order_status(session, order_id, new_status)
         
@@ -847,4 +620,3 @@ async def update_order_status_handler(callback: CallbackQuery):
     
     # Show alert notification to admin
     await callback.answer(f"Buyurtma holati yangilandi: {status_text}!", show_alert=True)
-    await bot.session.close()
@@ -1,8 +1,8 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from app.database.engine import async_session_maker
-from app.database.product_requests import get_products_by_type, get_product_by_id
+from app.database.catalog import catalog
+from app.keyboards.inline import get_category_products_keyboard
 from app.utils.formatters import format_price
 
 router = Router()
@@ -44,8 +44,7 @@ async def show_category_products(callback: CallbackQuery):
     
     category_type, title, description = category_data
     
-    async with async_session_maker() as session:
-        products = await get_products_by_type(session, category_type)
+    products = await catalog.get_by_type(category_type)
     
     if not products:
         await callback.message.edit_text(
@@ -59,22 +58,15 @@ async def show_category_products(callback: CallbackQuery):
         await callback.answer()
         return
     
-    keyboard = []
-    for product in products:
-        keyboard.append([
-            InlineKeyboardButton(
-                text=f"{product.name} - {format_price(product.price)} so'm",
-                callback_data=f"user_product_{product.id}"
-            )
-        ])
-    
-    keyboard.append([InlineKeyboardButton(text="🔙 Ortga", callback_data="back_to_other_products")])
+    keyboard = get_category_products_keyboard(
+        category_type, products, version=catalog.version, back_callback="back_to_other_products"
+    )
     
     await callback.message.edit_text(
         f"{title}\n\n"
         f"{description}\n\n"
         "Batafsil ma'lumot olish uchun mahsulotni tanlang:",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+        reply_markup=keyboard
     )
     await callback.answer()
 
@@ -103,19 +95,10 @@ async def back_to_other_products(callback: CallbackQuery):
 async def back_to_category(callback: CallbackQuery):
     product_type = callback.data.replace("back_to_", "")
     
-    async with async_session_maker() as session:
-        products = await get_products_by_type(session, product_type)
-    
-    keyboard = []
-    for product in products:
-        keyboard.append([
-            InlineKeyboardButton(
-                text=f"{product.name} - {format_price(product.price)} so'm",
-                callback_data=f"user_product_{product.id}"
-            )
-        ])
+    products = await catalog.get_by_type(product_type)
     
     # Determine the category info and back button
+    back_callback = None
     if product_type == "weight_loss":
         title = "🌿 <b>Vazn yo'qotish mahsulotlari</b>\n\n"
         description = "Bu toifadagi mahsulotlar tanangizning ortiqcha vaznini yo'qotishga yordam beradi.\n\n"
@@ -125,48 +108,50 @@ async def back_to_category(callback: CallbackQuery):
     elif product_type == "Nonushta":
         title = "🍳 <b>Nonushta</b>\n\n"
         description = "Kun boshiga energiya beruvchi mahsulotlar\n\n"
-        keyboard.append([InlineKeyboardButton(text="🔙 Ortga", callback_data="back_to_other_products")])
+        back_callback = "back_to_other_products"
     elif product_type == "Detox":
         title = "🥤 <b>Detox</b>\n\n"
         description = "Tanani tozalash va detoks qilish uchun mahsulotlar\n\n"
-        keyboard.append([InlineKeyboardButton(text="🔙 Ortga", callback_data="back_to_other_products")])
+        back_callback = "back_to_other_products"
     elif product_type == "tushliklar":
         title = "🍽 <b>Tushliklar</b>\n\n"
         description = "Kunning o'rtasida energiya beruvchi mahsulotlar\n\n"
-        keyboard.append([InlineKeyboardButton(text="🔙 Ortga", callback_data="back_to_other_products")])
+        back_callback = "back_to_other_products"
     elif product_type == "FruitMix":
         title = "🍓 <b>FruitMix</b>\n\n"
         description = "Mevali aralashma va vitaminlar\n\n"
-        keyboard.append([InlineKeyboardButton(text="🔙 Ortga", callback_data="back_to_other_products")])
+        back_callback = "back_to_other_products"
     elif product_type == "kechki ovqat":
         title = "🌙 <b>Kechki ovqat</b>\n\n"
         description = "Kechqurun iste'mol qilish uchun mahsulotlar\n\n"
-        keyboard.append([InlineKeyboardButton(text="🔙 Ortga", callback_data="back_to_other_products")])
+        back_callback = "back_to_other_products"
     else:
         title = f"<b>{product_type}</b>\n\n"
         description = ""
     
     text = title + description + "Batafsil ma'lumot olish uchun mahsulotni tanlang:"
+    keyboard = get_category_products_keyboard(
+        product_type, products, version=catalog.version, back_callback=back_callback
+    )
     
     # Check if current message has photo (no text to edit)
     if callback.message.photo:
         await callback.message.delete()
         await callback.message.answer(
             text,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+            reply_markup=keyboard
         )
     else:
         await callback.message.edit_text(
             text,
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+            reply_markup=keyboard
         )
     await callback.answer()
 
 
 @router.message(F.text == "🌿 Vazn yo'qotish")
 async def lose_weight_menu(message: Message):
-    async with async_session_maker() as session:
-        products = await get_products_by_type(session, "weight_loss")
+    products = await catalog.get_by_type("weight_loss")
     
     if not products:
         await message.answer(
@@ -176,14 +161,7 @@ async def lose_weight_menu(message: Message):
         )
         return
     
-    keyboard = []
-    for product in products:
-        keyboard.append([
-            InlineKeyboardButton(
-                text=f"{product.name} - {format_price(product.price)} so'm",
-                callback_data=f"user_product_{product.id}"
-            )
-        ])
+    keyboard = get_category_products_keyboard("weight_loss", products, version=catalog.version)
     
     await message.answer(
         "🌿 <b>Vazn yo'qotish mahsulotlari</b>\n\n"
@@ -193,14 +171,13 @@ async def lose_weight_menu(message: Message):
         "• <b>Dietik choylar</b>  \n"
         "• <b>Kaloriya paketlari</b>\n\n"
         "<i>Mahsulotga bosish → batafsil ma'lumot va narx ko‘rsatiladi.</i>",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+        reply_markup=keyboard
     )
 
 
 @router.message(F.text == "⚖️ Vazn olish")
 async def gain_weight_menu(message: Message):
-    async with async_session_maker() as session:
-        products = await get_products_by_type(session, "weight_gain")
+    products = await catalog.get_by_type("weight_gain")
     
     if not products:
         await message.answer(
@@ -210,14 +187,7 @@ async def gain_weight_menu(message: Message):
         )
         return
     
-    keyboard = []
-    for product in products:
-        keyboard.append([
-            InlineKeyboardButton(
-                text=f"{product.name} - {format_price(product.price)} so'm",
-                callback_data=f"user_product_{product.id}"
-            )
-        ])
+    keyboard = get_category_products_keyboard("weight_gain", products, version=catalog.version)
     
     await message.answer(
         "⚖️ <b>Vazn olish mahsulotlari</b>\n\n"
@@ -226,7 +196,7 @@ async def gain_weight_menu(message: Message):
         "• <b>Mass gain paketlari</b>  \n"
         "• <b>Vitamin va minerallar</b>\n\n"
         "<i>Mahsulotga bosish → batafsil ma'lumot va narx ko‘rsatiladi.</i>",
-        reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard)
+        reply_markup=keyboard
     )
 
 
@@ -234,8 +204,7 @@ async def gain_weight_menu(message: Message):
 async def view_user_product(callback: CallbackQuery):
     product_id = int(callback.data.split("_")[2])
     
-    async with async_session_maker() as session:
-        product = await get_product_by_id(session, product_id)
+    product = await catalog.get_by_id(product_id)
     
     if not product:
         await callback.answer("Mahsulot topilmadi!", show_alert=True)
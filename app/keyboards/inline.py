@@ -1,7 +1,31 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from app.utils.formatters import format_price
+from app.config import CHANNEL_ID, CHANNEL_USERNAME, CHANNEL_URL
 from math import ceil
 
+# Keyboards built from the product catalog, keyed by screen, category and page.
+# Entries belong to one catalog version and are dropped when it changes.
+_catalog_keyboards: dict[tuple, InlineKeyboardMarkup] = {}
+_catalog_keyboards_version = None
+
+
+def _cached_catalog_keyboard(key: tuple, version, build) -> InlineKeyboardMarkup:
+    """Return the cached markup for ``key``, building it once per catalog version.
+
+    ``version=None`` bypasses the cache (products not taken from the catalog).
+    Cached markups are shared between handlers and must not be mutated.
+    """
+    global _catalog_keyboards_version
+    if version is None:
+        return build()
+    if version != _catalog_keyboards_version:
+        _catalog_keyboards.clear()
+        _catalog_keyboards_version = version
+    markup = _catalog_keyboards.get(key)
+    if markup is None:
+        markup = _catalog_keyboards[key] = build()
+    return markup
+
 
 def get_admin_panel_keyboard():
     keyboard = InlineKeyboardMarkup(
@@ -16,6 +40,7 @@ def get_admin_panel_keyboard():
                 InlineKeyboardButton(text="💰 Daromad statistikasi", callback_data="revenue_stats")
             ],
             [InlineKeyboardButton(text="❌ Bekor qilingan Buyurtmalar", callback_data="cancelled_orders_stats")],
+            [InlineKeyboardButton(text="📈 Analitika", callback_data="analytics")],
             [InlineKeyboardButton(text="📢 Barcha foydalanuvchilarga habar yuborish", callback_data="admin_broadcast")],
             [InlineKeyboardButton(text="🔙 Asosiy menyuga qaytish", callback_data="admin_back_main")]
         ]
@@ -23,8 +48,43 @@ def get_admin_panel_keyboard():
     return keyboard
 
 
-def get_product_list_keyboard(products, page=0, items_per_page=10):
-    """Get paginated product list keyboard"""
+def get_subscription_keyboard():
+    """Get keyboard for subscription request"""
+    # Determine the channel URL to use
+    if CHANNEL_URL:
+        # Use the full URL if provided
+        channel_url = CHANNEL_URL
+    elif CHANNEL_USERNAME:
+        # Construct URL from username
+        username = CHANNEL_USERNAME.lstrip('@')
+        channel_url = f"https://t.me/{username}"
+    elif CHANNEL_ID and CHANNEL_ID.startswith('-100'):
+        # For channel IDs starting with -100, construct the URL differently
+        channel_identifier = CHANNEL_ID[4:]
+        channel_url = f"https://t.me/c/{channel_identifier}"
+    elif CHANNEL_ID:
+        # If it's a username or different format
+        channel_url = f"https://t.me/{CHANNEL_ID.lstrip('@')}"
+    else:
+        # Default fallback
+        channel_url = "https://t.me/"
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="📢 Kanalga obuna bo'lish", url=channel_url)],
+        [InlineKeyboardButton(text="✅ Tekshirish", callback_data="check_subscription")]
+    ])
+    return keyboard
+
+
+def get_product_list_keyboard(products, page=0, items_per_page=10, version=None):
+    """Get paginated product list keyboard (cached per catalog ``version`` when given)"""
+    return _cached_catalog_keyboard(
+        ("admin_list", None, page, items_per_page), version,
+        lambda: _build_product_list_keyboard(products, page, items_per_page)
+    )
+
+
+def _build_product_list_keyboard(products, page, items_per_page):
     total_pages = ceil(len(products) / items_per_page)
     start_idx = page * items_per_page
     end_idx = start_idx + items_per_page
@@ -56,8 +116,15 @@ def get_product_list_keyboard(products, page=0, items_per_page=10):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_product_edit_keyboard(products, page=0, items_per_page=10):
-    """Get paginated product edit keyboard"""
+def get_product_edit_keyboard(products, page=0, items_per_page=10, version=None):
+    """Get paginated product edit keyboard (cached per catalog ``version`` when given)"""
+    return _cached_catalog_keyboard(
+        ("admin_edit", None, page, items_per_page), version,
+        lambda: _build_product_edit_keyboard(products, page, items_per_page)
+    )
+
+
+def _build_product_edit_keyboard(products, page, items_per_page):
     total_pages = ceil(len(products) / items_per_page)
     start_idx = page * items_per_page
     end_idx = start_idx + items_per_page
@@ -89,8 +156,15 @@ def get_product_edit_keyboard(products, page=0, items_per_page=10):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_product_delete_keyboard(products, page=0, items_per_page=10):
-    """Get paginated product delete keyboard"""
+def get_product_delete_keyboard(products, page=0, items_per_page=10, version=None):
+    """Get paginated product delete keyboard (cached per catalog ``version`` when given)"""
+    return _cached_catalog_keyboard(
+        ("admin_delete", None, page, items_per_page), version,
+        lambda: _build_product_delete_keyboard(products, page, items_per_page)
+    )
+
+
+def _build_product_delete_keyboard(products, page, items_per_page):
     total_pages = ceil(len(products) / items_per_page)
     start_idx = page * items_per_page
     end_idx = start_idx + items_per_page
@@ -122,6 +196,23 @@ def get_product_delete_keyboard(products, page=0, items_per_page=10):
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def get_category_products_keyboard(product_type, products, version=None, back_callback=None):
+    """Product buttons of one category for users (cached per catalog ``version`` when given)"""
+    def build():
+        keyboard = [
+            [InlineKeyboardButton(
+                text=f"{product.name} - {format_price(product.price)} so'm",
+                callback_data=f"user_product_{product.id}"
+            )]
+            for product in products
+        ]
+        if back_callback:
+            keyboard.append([InlineKeyboardButton(text="🔙 Ortga", callback_data=back_callback)])
+        return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+    return _cached_catalog_keyboard(("category", product_type, back_callback), version, build)
+
+
 def get_product_detail_keyboard(product_id):
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -241,7 +332,9 @@ def get_broadcast_confirm_keyboard():
     return keyboard
 
 
-def get_user_stats_keyboard():
+# Statistics keyboards: ``refresh`` is the callback data of the screen being
+# shown, which adds a "refresh" button that re-renders it with fresh numbers
+def get_user_stats_keyboard(refresh: str = None):
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="👥 Barcha Userlar", callback_data="all_users_stats")],
@@ -250,10 +343,12 @@ def get_user_stats_keyboard():
             [InlineKeyboardButton(text="🔙 Admin panelga qaytish", callback_data="admin_panel")]
         ]
     )
+    if refresh:
+        keyboard.inline_keyboard.insert(-1, [InlineKeyboardButton(text="🔄 Yangilash", callback_data=f"stats_refresh_{refresh}")])
     return keyboard
 
 
-def get_revenue_stats_keyboard():
+def get_revenue_stats_keyboard(refresh: str = None):
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="📅 1 kunlik daromad", callback_data="daily_revenue_stats")],
@@ -262,10 +357,12 @@ def get_revenue_stats_keyboard():
             [InlineKeyboardButton(text="🔙 Admin panelga qaytish", callback_data="admin_panel")]
         ]
     )
+    if refresh:
+        keyboard.inline_keyboard.insert(-1, [InlineKeyboardButton(text="🔄 Yangilash", callback_data=f"stats_refresh_{refresh}")])
     return keyboard
 
 
-def get_cancelled_orders_stats_keyboard():
+def get_cancelled_orders_stats_keyboard(refresh: str = None):
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [InlineKeyboardButton(text="📅 1 kunlik", callback_data="daily_cancelled_stats")],
@@ -274,4 +371,22 @@ def get_cancelled_orders_stats_keyboard():
             [InlineKeyboardButton(text="🔙 Admin panelga qaytish", callback_data="admin_panel")]
         ]
     )
+    if refresh:
+        keyboard.inline_keyboard.insert(-1, [InlineKeyboardButton(text="🔄 Yangilash", callback_data=f"stats_refresh_{refresh}")])
+    return keyboard
+
+
+def get_analytics_keyboard():
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="🏆 Top (daromad)", callback_data="analytics_top_revenue"),
+                InlineKeyboardButton(text="📦 Top (soni)", callback_data="analytics_top_units")
+            ],
+            [InlineKeyboardButton(text="🏢 Filiallar bo'yicha daromad", callback_data="analytics_branches")],
+            [InlineKeyboardButton(text="🚚 Olib ketish / Yetkazib berish", callback_data="analytics_delivery")],
+            [InlineKeyboardButton(text="🕒 Buyurtmalar vaqti (soat x kun)", callback_data="analytics_heatmap")],
+            [InlineKeyboardButton(text="🔙 Admin panelga qaytish", callback_data="admin_panel")]
+        ]
+    )
     return keyboard
@@ -0,0 +1,52 @@
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import Message, CallbackQuery, TelegramObject
+from app.keyboards.inline import get_subscription_keyboard
+from app.utils.subscription import check_subscription, SUBSCRIBE_TEXT
+from app.config import is_admin
+
+
+class SubscriptionMiddleware(BaseMiddleware):
+    """Let only channel members reach the handlers of a router.
+
+    Registered on a router's message and callback_query observers, it runs
+    once for the handler that matched an update. Admins, non-private chats
+    (e.g. order status buttons in the orders group) and handlers flagged
+    with ``flags={'skip_subscription': True}`` are not checked. Non-members
+    get the subscription prompt instead of the handler.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        chat = data.get('event_chat')
+        if (
+            user is None
+            or is_admin(user.id)
+            or (chat is not None and chat.type != 'private')
+            or get_flag(data, 'skip_subscription')
+        ):
+            return await handler(event, data)
+
+        if await check_subscription(data['bot'], user.id):
+            return await handler(event, data)
+
+        if isinstance(event, Message):
+            await event.answer(SUBSCRIBE_TEXT, reply_markup=get_subscription_keyboard())
+        elif isinstance(event, CallbackQuery):
+            await event.answer()
+            if event.message:
+                await event.message.answer(SUBSCRIBE_TEXT, reply_markup=get_subscription_keyboard())
+        return None
+
+
+def setup_subscription_gate(router):
+    """Gate every message and callback handler of ``router`` behind the channel check"""
+    middleware = SubscriptionMiddleware()
+    router.message.middleware(middleware)
+    router.callback_query.middleware(middleware)
@@ -0,0 +1,39 @@
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from app.database.user_cache import user_cache
+
+
+def _wants_current_user(handler_object) -> bool:
+    """Whether the matched handler receives ``current_user`` (aiogram passes only declared arguments)"""
+    return handler_object is None or handler_object.varkw or 'current_user' in handler_object.params
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Inject ``current_user`` (a UserContext, or None if not registered) into handler data.
+
+    The user is resolved from the tg_id -> user cache once per handled update,
+    so handlers do not open a session just to call get_user_by_tg_id. Handlers
+    that do not take a ``current_user`` argument (product browsing, basket
+    views) are passed through without a lookup.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any]
+    ) -> Any:
+        if not _wants_current_user(data.get('handler')):
+            return await handler(event, data)
+        user = data.get('event_from_user')
+        if 'current_user' not in data:
+            data['current_user'] = await user_cache.get(user.id) if user else None
+        return await handler(event, data)
+
+
+def setup_user_context(router):
+    """Resolve ``current_user`` for the message and callback handlers of ``router`` that take it"""
+    middleware = UserContextMiddleware()
+    router.message.middleware(middleware)
+    router.callback_query.middleware(middleware)
@@ -0,0 +1,78 @@
+from decimal import Decimal
+from functools import lru_cache
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from app.utils.formatters import format_price
+
+BASKET_TITLE = "🛒 <b>Mening savatim</b>\n\n"
+EMPTY_BASKET_TEXT = (
+    "🛒 <b>Mening savatim</b>\n\n"
+    "Savat bo'sh.\n"
+    "Buyurtma yaratish uchun mahsulotlarni savatga qo'shing!"
+)
+CONFIRM_ROW = (InlineKeyboardButton(text="✅ Buyurtmani tasdiqlash", callback_data="confirm_order_prompt"),)
+
+
+@lru_cache(maxsize=4096)
+def basket_line_text(name: str, price: Decimal, quantity: int, description: str | None) -> str:
+    """Text of one basket/order line; memoized, a line only changes with its quantity"""
+    return (
+        f"• {name}\n"
+        f"  📝 {description or ''}\n"
+        f"  💰 {format_price(price)} so'm x {quantity} = {format_price(price * quantity)} so'm\n\n"
+    )
+
+
+@lru_cache(maxsize=4096)
+def _quantity_row(product_id: int, quantity: int) -> tuple[InlineKeyboardButton, ...]:
+    return (
+        InlineKeyboardButton(text="➖", callback_data=f"basket_dec_{product_id}_{quantity}"),
+        InlineKeyboardButton(text=f"{quantity}", callback_data="basket_display"),
+        InlineKeyboardButton(text="➕", callback_data=f"basket_inc_{product_id}_{quantity}")
+    )
+
+
+def render_basket_lines(lines) -> str:
+    """Item list of a basket or a placed order.
+
+    ``lines`` are rows with ``name``, ``price``, ``quantity`` and
+    ``description`` (get_basket_view, place_order_from_basket).
+    """
+    return "".join(
+        basket_line_text(line.name, line.price, line.quantity, line.description)
+        for line in lines
+    )
+
+
+def render_basket(lines, total: Decimal) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Text and ➖/➕ keyboard of the basket message for get_basket_view rows"""
+    if not lines:
+        return EMPTY_BASKET_TEXT, None
+
+    text = "".join((
+        BASKET_TITLE,
+        render_basket_lines(lines),
+        "━━━━━━━━━━━━━━━\n",
+        f"💵 <b>Jami: {format_price(total)} so'm</b>"
+    ))
+    keyboard = [list(_quantity_row(line.product_id, line.quantity)) for line in lines]
+    keyboard.append(list(CONFIRM_ROW))
+    return text, InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def _benchmark(items: int = 20, repeat: int = 10000):
+    """Time render_basket on a synthetic basket: python -m app.utils.basket_render"""
+    import timeit
+    from collections import namedtuple
+
+    Line = namedtuple('Line', 'product_id quantity name price description line_total')
+    lines = [
+        Line(i, i % 5 + 1, f"Mahsulot {i}", Decimal('45000.00') + i, "Tavsif", (Decimal('45000.00') + i) * (i % 5 + 1))
+        for i in range(items)
+    ]
+    total = sum(line.line_total for line in lines)
+    seconds = timeit.timeit(lambda: render_basket(lines, total), number=repeat)
+    print(f"render_basket, {items} items: {seconds / repeat * 1e6:.1f} µs per render")
+
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import time
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from app.database.engine import async_session_maker
+from app.database.requests import iter_recipient_batches
+from app.database.broadcast_requests import (
+    get_running_broadcast_jobs,
+    update_broadcast_progress,
+    finish_broadcast_job
+)
+from app.keyboards.inline import get_admin_panel_keyboard
+from app.config import (
+    BROADCAST_RATE, BROADCAST_CHAT_INTERVAL, BROADCAST_WORKERS,
+    BROADCAST_BATCH_SIZE, BROADCAST_PROGRESS_INTERVAL
+)
+
+ADMIN_HEADER = "📢 <b>Admin habari</b>\n\n"
+MAX_SEND_ATTEMPTS = 5
+
+# Strong references to running jobs so they are not garbage collected
+_running_tasks: set[asyncio.Task] = set()
+
+
+class TokenBucket:
+    """Global rate limiter: ``rate`` tokens per second, bursts up to ``capacity``.
+
+    ``pause`` blocks every caller, which is how a RetryAfter (flood control is
+    per bot, not per chat) is propagated to all workers.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# One bucket for the whole bot: Telegram's limit is per bot token, so jobs
+# running at the same time (e.g. a resumed one and a new one) share it
+broadcast_bucket = TokenBucket(BROADCAST_RATE)
+
+
+class ChatLimiter:
+    """Keeps at least ``interval`` seconds between two messages to the same chat"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_send: dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = time.monotonic()
+        next_send = self._next_send.get(chat_id, now)
+        if next_send > now:
+            await asyncio.sleep(next_send - now)
+        self._next_send[chat_id] = max(now, next_send) + self.interval
+
+    def release(self, chat_id: int):
+        self._next_send.pop(chat_id, None)
+
+
+def build_progress_text(message_data: dict, total: int, sent: int, failed: int) -> str:
+    content_type = message_data.get('content_type', 'text')
+    return (
+        f"📤 <b>Habar yuborilmoqda...</b>\n\n"
+        f"Jami foydalanuvchilar: {total}\n"
+        f"Tur: {content_type}\n\n"
+        f"✅ Yuborildi: {sent}\n"
+        f"❌ Xatolik: {failed}"
+    )
+
+
+def build_result_text(total: int, sent: int, failed: int) -> str:
+    return (
+        f"✅ <b>Habar yuborish yakunlandi!</b>\n\n"
+        f"📊 Natija:\n"
+        f"• Muvaffaqiyatli yuborildi: {sent}\n"
+        f"• Xatolik yuz berdi: {failed}\n"
+        f"• Jami: {total}"
+    )
+
+
+class BroadcastEngine:
+    """Sends one persisted broadcast job to every user.
+
+    Recipients are read in keyset batches ordered by tg_id. Each batch is sent
+    by a bounded pool of workers behind the bot-wide token bucket (shared
+    with every other running job) and the per-chat limiter; once the whole
+    batch is done the cursor and counters are saved, so a restart resumes
+    from the last finished batch instead of resending from the beginning.
+    """
+
+    def __init__(self, bot: Bot, job, bucket: TokenBucket = None, chat_limiter: ChatLimiter = None,
+                 workers: int = BROADCAST_WORKERS, batch_size: int = BROADCAST_BATCH_SIZE):
+        self.bot = bot
+        self.job_id = job.id
+        self.message_data = job.message_data
+        self.admin_chat_id = job.admin_chat_id
+        self.admin_message_id = job.admin_message_id
+        self.cursor = job.last_tg_id
+        self.total = job.total
+        self.sent = job.sent
+        self.failed = job.failed
+        self.bucket = bucket or broadcast_bucket
+        self.chat_limiter = chat_limiter or ChatLimiter(BROADCAST_CHAT_INTERVAL)
+        self.semaphore = asyncio.Semaphore(workers)
+        self.batch_size = batch_size
+        self._last_progress_at = 0.0
+
+    async def _call(self, method, chat_id: int, **kwargs):
+        for attempt in range(MAX_SEND_ATTEMPTS):
+            await self.bucket.acquire()
+            await self.chat_limiter.wait(chat_id)
+            try:
+                return await method(chat_id=chat_id, **kwargs)
+            except TelegramRetryAfter as e:
+                logging.warning(f"Broadcast {self.job_id}: flood control, retry after {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+        raise RuntimeError(f"Gave up sending to {chat_id} after {MAX_SEND_ATTEMPTS} attempts")
+
+    async def send_content(self, chat_id: int):
+        data = self.message_data
+        content_type = data['content_type']
+        caption = data.get('caption') or ''
+        final_caption = f"{ADMIN_HEADER}{caption}" if caption else ADMIN_HEADER.strip()
+        bot = self.bot
+
+        if content_type == 'text':
+            await self._call(bot.send_message, chat_id, text=f"{ADMIN_HEADER}{data['text']}")
+        elif content_type == 'photo':
+            await self._call(bot.send_photo, chat_id, photo=data['photo'], caption=final_caption)
+        elif content_type == 'video':
+            await self._call(bot.send_video, chat_id, video=data['video'], caption=final_caption)
+        elif content_type == 'animation':
+            await self._call(bot.send_animation, chat_id, animation=data['animation'], caption=final_caption)
+        elif content_type == 'document':
+            await self._call(bot.send_document, chat_id, document=data['document'], caption=final_caption)
+        elif content_type == 'audio':
+            await self._call(bot.send_audio, chat_id, audio=data['audio'], caption=final_caption)
+        else:
+            # Content without a caption: send the admin header first, then the content
+            await self._call(bot.send_message, chat_id, text=ADMIN_HEADER.strip())
+            if content_type == 'voice':
+                await self._call(bot.send_voice, chat_id, voice=data['voice'])
+            elif content_type == 'video_note':
+                await self._call(bot.send_video_note, chat_id, video_note=data['video_note'])
+            elif content_type == 'sticker':
+                await self._call(bot.send_sticker, chat_id, sticker=data['sticker'])
+            elif content_type == 'location':
+                location = data['location']
+                await self._call(
+                    bot.send_location, chat_id,
+                    latitude=location['latitude'],
+                    longitude=location['longitude']
+                )
+            elif content_type == 'contact':
+                contact = data['contact']
+                await self._call(
+                    bot.send_contact, chat_id,
+                    phone_number=contact['phone_number'],
+                    first_name=contact['first_name'],
+                    last_name=contact.get('last_name')
+                )
+
+    async def _deliver(self, chat_id: int):
+        async with self.semaphore:
+            try:
+                await self.send_content(chat_id)
+                self.sent += 1
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Blocked the bot, deleted account, etc. - retrying will not help
+                self.failed += 1
+                logging.info(f"Broadcast {self.job_id}: skipped user {chat_id}: {e}")
+            except Exception as e:
+                self.failed += 1
+                logging.warning(f"Failed to send message to user {chat_id}: {e}")
+            finally:
+                self.chat_limiter.release(chat_id)
+
+    async def _edit_admin_message(self, text: str, reply_markup=None):
+        if not self.admin_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=self.admin_chat_id,
+                message_id=self.admin_message_id,
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            logging.debug(f"Broadcast {self.job_id}: could not edit progress message: {e}")
+
+    async def _report_progress(self):
+        now = time.monotonic()
+        if now - self._last_progress_at < BROADCAST_PROGRESS_INTERVAL:
+            return
+        self._last_progress_at = now
+        await self._edit_admin_message(
+            build_progress_text(self.message_data, self.total, self.sent, self.failed)
+        )
+
+    async def run(self):
+        async with async_session_maker() as session:
+            async for batch in iter_recipient_batches(session, self.batch_size, self.cursor):
+                await asyncio.gather(*(self._deliver(tg_id) for tg_id in batch))
+                self.cursor = batch[-1]
+
+                await update_broadcast_progress(session, self.job_id, self.cursor, self.sent, self.failed)
+                await self._report_progress()
+
+            await finish_broadcast_job(session, self.job_id)
+
+        processed = self.sent + self.failed
+        await self._edit_admin_message(
+            build_result_text(max(self.total, processed), self.sent, self.failed),
+            reply_markup=get_admin_panel_keyboard()
+        )
+        logging.info(f"Broadcast {self.job_id} finished: sent={self.sent}, failed={self.failed}")
+
+
+def run_broadcast_job(bot: Bot, job) -> asyncio.Task:
+    """Run a broadcast job in the background and return its task"""
+    engine = BroadcastEngine(bot, job)
+    task = asyncio.create_task(engine.run(), name=f"broadcast-{job.id}")
+    _running_tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+def _on_task_done(task: asyncio.Task):
+    _running_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        logging.error(f"Broadcast task {task.get_name()} crashed: {task.exception()}")
+
+
+async def resume_broadcasts(bot: Bot):
+    """Restart broadcasts that were still running when the bot stopped"""
+    async with async_session_maker() as session:
+        jobs = await get_running_broadcast_jobs(session)
+    for job in jobs:
+        logging.info(f"Resuming broadcast {job.id} after tg_id {job.last_tg_id}")
+        run_broadcast_job(bot, job)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Hashable
+
+
+class Debouncer:
+    """Coalesce bursts of calls per key into one call after a quiet window.
+
+    ``schedule(key, callback)`` (re)starts the ``delay`` window for ``key``;
+    when no new call arrived for ``delay`` seconds the latest callback runs
+    once. Calls scheduled while a callback is running start a new window, so
+    the last state is always rendered and a running callback is never
+    cancelled halfway. ``cancel(key)`` drops the pending call before the
+    caller takes the target over (e.g. edits the same message itself).
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._pending: dict[Hashable, tuple[float, Callable[[], Awaitable]]] = {}
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+        self._running: set[Hashable] = set()
+
+    def schedule(self, key: Hashable, callback: Callable[[], Awaitable]):
+        self._pending[key] = (time.monotonic() + self.delay, callback)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    async def cancel(self, key: Hashable):
+        """Drop the pending call for ``key``; a call already running is waited for, so it cannot land later"""
+        self._pending.pop(key, None)
+        task = self._tasks.get(key)
+        if task is None:
+            return
+        if key in self._running:
+            await asyncio.wait([task])
+        else:
+            del self._tasks[key]
+            task.cancel()
+
+    async def wait(self):
+        """Wait until every scheduled call has run"""
+        while self._tasks:
+            await asyncio.wait(list(self._tasks.values()))
+
+    async def _run(self, key: Hashable):
+        try:
+            while key in self._pending:
+                deadline, callback = self._pending[key]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+                    continue
+                del self._pending[key]
+                self._running.add(key)
+                try:
+                    await callback()
+                except Exception as e:
+                    logging.warning(f"Debounced call for {key} failed: {e}")
+                finally:
+                    self._running.discard(key)
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
@@ -0,0 +1,208 @@
+import copy
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Mapping
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import select, delete, case, or_, and_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.database.engine import async_session_maker
+from app.database.models import FSMRecord
+from app.config import FSM_STORAGE, FSM_STATE_TTL, FSM_STORAGE_FALLBACK, REDIS_URL
+
+# Seconds between purges of expired rows by PostgresStorage
+PURGE_INTERVAL = 600
+
+
+def _state_name(state: StateType) -> str | None:
+    return state.state if isinstance(state, State) else state
+
+
+class MemoryTTLStorage(BaseStorage):
+    """In-process FSM storage whose records expire ``ttl`` seconds after the last write.
+
+    Like aiogram's MemoryStorage, but an abandoned flow (a checkout left at
+    the location step, a half-filled product form) does not stay in memory
+    forever. Records are kept in write order, so every write only has to pop
+    expired records from the front. ``ttl=None`` disables expiry.
+    """
+
+    def __init__(self, ttl: float | None = None):
+        self.ttl = ttl
+        self._records: OrderedDict = OrderedDict()
+
+    def _get_record(self, key: StorageKey) -> dict | None:
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record['expires_at'] is not None and record['expires_at'] < time.monotonic():
+            del self._records[key]
+            return None
+        return record
+
+    def _touch(self, key: StorageKey, record: dict):
+        now = time.monotonic()
+        if not record['state'] and not record['data']:
+            self._records.pop(key, None)
+        else:
+            record['expires_at'] = now + self.ttl if self.ttl else None
+            self._records[key] = record
+            self._records.move_to_end(key)
+
+        if self.ttl:
+            while self._records:
+                oldest = next(iter(self._records.values()))
+                if oldest['expires_at'] >= now:
+                    break
+                self._records.popitem(last=False)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._get_record(key) or {'state': None, 'data': {}}
+        record['state'] = _state_name(state)
+        self._touch(key, record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = self._get_record(key)
+        return record['state'] if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = self._get_record(key) or {'state': None, 'data': {}}
+        record['data'] = copy.copy(dict(data))
+        self._touch(key, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = self._get_record(key)
+        return copy.copy(record['data']) if record else {}
+
+    async def close(self) -> None:
+        pass
+
+
+class PostgresStorage(BaseStorage):
+    """FSM storage in the ``fsm_records`` table, shared by every bot process.
+
+    State and data live in one row per storage key and survive restarts.
+    Rows expire ``ttl`` seconds after the last write (database clock): expired
+    rows are ignored on read, reset on the next write and deleted in bulk at
+    most every PURGE_INTERVAL seconds. Data must be JSON-serializable.
+    """
+
+    def __init__(self, ttl: float | None = None, key_builder: DefaultKeyBuilder | None = None):
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self._last_purge = time.monotonic()
+
+    def _expires_at(self):
+        return func.now() + timedelta(seconds=self.ttl) if self.ttl else None
+
+    @staticmethod
+    def _alive():
+        return or_(FSMRecord.expires_at.is_(None), FSMRecord.expires_at > func.now())
+
+    async def _write(self, key: StorageKey, state: str | None = None, data: dict | None = None):
+        """Upsert the state or the data of ``key``; the other column is kept unless the row expired"""
+        expired = and_(FSMRecord.expires_at.is_not(None), FSMRecord.expires_at <= func.now())
+        stmt = pg_insert(FSMRecord).values(
+            key=self.key_builder.build(key),
+            state=state,
+            data=data if data is not None else {},
+            expires_at=self._expires_at()
+        )
+        # The inserted row carries the empty value of the column not being written
+        if data is None:
+            values = {'state': stmt.excluded.state, 'data': case((expired, stmt.excluded.data), else_=FSMRecord.data)}
+        else:
+            values = {'data': stmt.excluded.data, 'state': case((expired, stmt.excluded.state), else_=FSMRecord.state)}
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_={**values, 'expires_at': stmt.excluded.expires_at, 'updated_at': func.now()}
+        ).returning(FSMRecord.id, FSMRecord.state, FSMRecord.data)
+
+        async with async_session_maker() as session:
+            row = (await session.execute(stmt)).one()
+            if row.state is None and not row.data:
+                # Nothing left to remember (state.clear())
+                await session.execute(delete(FSMRecord).where(FSMRecord.id == row.id))
+            if time.monotonic() - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = time.monotonic()
+                await session.execute(delete(FSMRecord).where(FSMRecord.expires_at <= func.now()))
+            await session.commit()
+
+    async def _read(self, key: StorageKey, column):
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(column).where(FSMRecord.key == self.key_builder.build(key), self._alive())
+            )
+            return result.scalar_one_or_none()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, state=_state_name(state))
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return await self._read(key, FSMRecord.state)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._write(key, data=dict(data))
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return await self._read(key, FSMRecord.data) or {}
+
+    async def close(self) -> None:
+        pass
+
+
+def build_redis_storage(redis, ttl: float | None = None) -> BaseStorage:
+    """aiogram's RedisStorage on top of ``redis`` (any Redis-protocol client, e.g. fakeredis)"""
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    ttl = int(ttl) if ttl else None
+    return RedisStorage(
+        redis=redis,
+        key_builder=DefaultKeyBuilder(with_destiny=True),
+        state_ttl=ttl,
+        data_ttl=ttl
+    )
+
+
+def _redis_unavailable(reason: str, fallback: bool, ttl: float | None) -> BaseStorage:
+    if not fallback:
+        raise RuntimeError(f"FSM_STORAGE=redis: {reason}; fix Redis or set FSM_STORAGE_FALLBACK=true")
+    # Opt-in only: states are then per process and lost on restart
+    logging.warning(f"FSM_STORAGE=redis: {reason}, using memory storage (FSM_STORAGE_FALLBACK)")
+    return MemoryTTLStorage(ttl=ttl)
+
+
+async def create_fsm_storage(backend: str = FSM_STORAGE, fallback: bool = FSM_STORAGE_FALLBACK) -> BaseStorage:
+    """FSM storage selected by FSM_STORAGE: 'memory', 'redis' or 'postgres'.
+
+    The Redis backend needs the ``redis`` package and a reachable server.
+    Without them startup fails with RuntimeError, unless ``fallback``
+    (FSM_STORAGE_FALLBACK) allows local memory storage instead.
+    """
+    ttl = FSM_STATE_TTL or None
+
+    if backend == 'redis':
+        try:
+            from redis.asyncio import Redis
+        except ImportError:
+            return _redis_unavailable("the 'redis' package is not installed", fallback, ttl)
+
+        redis = Redis.from_url(REDIS_URL)
+        try:
+            await redis.ping()
+        except Exception as e:
+            await redis.aclose()
+            return _redis_unavailable(f"Redis at {REDIS_URL} is unavailable ({e})", fallback, ttl)
+        logging.info("FSM storage: redis")
+        return build_redis_storage(redis, ttl=ttl)
+
+    if backend == 'postgres':
+        logging.info("FSM storage: postgres")
+        return PostgresStorage(ttl=ttl)
+
+    if backend != 'memory':
+        raise ValueError(f"Unknown FSM_STORAGE: {backend!r} (expected 'memory', 'redis' or 'postgres')")
+    logging.info("FSM storage: memory")
+    return MemoryTTLStorage(ttl=ttl)
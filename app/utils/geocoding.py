@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from geopy.geocoders import Nominatim
+from geopy.exc import GeocoderTimedOut
+from app.utils.ttl_cache import TTLCache
+from app.config import GEOCODER_BACKEND, GEOCODER_CACHE_SIZE, GEOCODER_CACHE_TTL, GEOCODER_PRECISION
+
+ADDRESS_NOT_FOUND = "Manzil aniqlanmadi"
+ADDRESS_TIMEOUT = "Manzil aniqlanmadi (timeout)"
+
+
+def format_address(raw_address: dict, full_address: str = None) -> str:
+    """Build a short address (house, street, neighbourhood, district) from geocoder components"""
+    parts = []
+
+    # House number and road/street
+    if raw_address.get('house_number'):
+        parts.append(raw_address['house_number'])
+    if raw_address.get('road'):
+        parts.append(raw_address['road'])
+    elif raw_address.get('street'):
+        parts.append(raw_address['street'])
+
+    # Neighborhood or suburb
+    if raw_address.get('neighbourhood'):
+        parts.append(raw_address['neighbourhood'])
+    elif raw_address.get('suburb'):
+        parts.append(raw_address['suburb'])
+
+    # District
+    if raw_address.get('city_district'):
+        parts.append(raw_address['city_district'])
+
+    if parts:
+        return ", ".join(parts)
+    return full_address or ADDRESS_NOT_FOUND
+
+
+class NominatimBackend:
+    """Reverse geocoding through OpenStreetMap Nominatim.
+
+    geopy's Nominatim client is synchronous, so lookups run in a worker
+    thread to keep the event loop free.
+    """
+
+    def __init__(self, user_agent: str = "massfit_bot", timeout: float = 5):
+        self.geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def _reverse(self, latitude: float, longitude: float) -> str:
+        location = self.geolocator.reverse(f"{latitude}, {longitude}", language="uz")
+        if location and location.raw.get('address'):
+            return format_address(location.raw['address'], location.address)
+        return ADDRESS_NOT_FOUND
+
+    async def reverse(self, latitude: float, longitude: float) -> str:
+        return await asyncio.to_thread(self._reverse, latitude, longitude)
+
+
+class StubBackend:
+    """Offline backend that never leaves the process (tests and local runs)"""
+
+    def __init__(self, address: str = None):
+        self.address = address
+        self.calls = 0
+
+    async def reverse(self, latitude: float, longitude: float) -> str:
+        self.calls += 1
+        return self.address or f"{latitude}, {longitude}"
+
+
+class GeocodingService:
+    """Async reverse geocoder with an LRU/TTL cache and request coalescing.
+
+    Coordinates are rounded to ``precision`` decimal places before lookup, so
+    customers sharing locations a few metres apart hit the same cache entry.
+    Concurrent lookups for the same key share a single backend call.
+    """
+
+    def __init__(self, backend, max_size: int = 1024, ttl: float = 86400, precision: int = 4):
+        self.backend = backend
+        self.precision = precision
+        # Failed lookups are not cached so the next customer retries
+        self._cache = TTLCache(max_size=max_size, ttl=lambda address: None if address == ADDRESS_NOT_FOUND else ttl)
+
+    def _key(self, latitude: float, longitude: float) -> tuple:
+        return round(latitude, self.precision), round(longitude, self.precision)
+
+    async def reverse(self, latitude: float, longitude: float) -> str:
+        key = self._key(latitude, longitude)
+        try:
+            return await self._cache.get_or_load(key, lambda: self.backend.reverse(*key))
+        except GeocoderTimedOut:
+            return ADDRESS_TIMEOUT
+        except Exception as e:
+            logging.warning(f"Reverse geocoding failed for {key}: {e}")
+            return ADDRESS_NOT_FOUND
+
+    def set_backend(self, backend):
+        """Swap the backend (e.g. a StubBackend in tests) and drop cached results"""
+        self.backend = backend
+        self._cache.clear()
+
+
+def _create_backend(name: str):
+    if name == 'stub':
+        return StubBackend()
+    return NominatimBackend()
+
+
+geocoding_service = GeocodingService(
+    _create_backend(GEOCODER_BACKEND),
+    max_size=GEOCODER_CACHE_SIZE,
+    ttl=GEOCODER_CACHE_TTL,
+    precision=GEOCODER_PRECISION
+)
+
+
+async def get_address_from_coords(latitude: float, longitude: float) -> str:
+    """Get address name from coordinates using reverse geocoding."""
+    return await geocoding_service.reverse(latitude, longitude)
@@ -0,0 +1,76 @@
+import logging
+from aiogram.exceptions import TelegramAPIError
+from app.utils.ttl_cache import TTLCache
+from app.config import (
+    CHANNEL_ID, CHANNEL_USERNAME, ENABLE_SUBSCRIPTION_CHECK, SUBSCRIPTION_CACHE_SIZE,
+    SUBSCRIPTION_CACHE_TTL, SUBSCRIPTION_NEGATIVE_TTL
+)
+
+MEMBER_STATUSES = ('creator', 'administrator', 'member')
+SUBSCRIBE_TEXT = (
+    "🔒 <b>Botdan foydalanish uchun kanalga obuna bo'ling!</b>\n\n"
+    "Bizning kanalimizga obuna bo'lib, botning barcha imkoniyatlaridan foydalaning.\n\n"
+    "Obuna bo'lgandan keyin \"✅ Tekshirish\" tugmasini bosing."
+)
+
+
+def get_channel_identifier() -> str | None:
+    """Chat identifier used for get_chat_member (username preferred over ID)"""
+    if CHANNEL_USERNAME:
+        # Use username (with or without @)
+        return CHANNEL_USERNAME if CHANNEL_USERNAME.startswith('@') else f"@{CHANNEL_USERNAME}"
+    # Fall back to ID if username is not provided
+    return CHANNEL_ID or None
+
+
+class SubscriptionCache:
+    """Per-user channel membership cache in front of ``bot.get_chat_member``.
+
+    Members are remembered for ``ttl`` seconds, non-members only for
+    ``negative_ttl`` so a user who just subscribed is let in quickly. API
+    errors are never cached. Concurrent checks for one user share a single
+    Bot API call.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 600, negative_ttl: float = 15):
+        self._cache = TTLCache(max_size=max_size, ttl=lambda is_member: ttl if is_member else negative_ttl)
+
+    async def _lookup(self, bot, channel: str, user_id: int) -> bool:
+        chat_member = await bot.get_chat_member(channel, user_id)
+        return chat_member.status in MEMBER_STATUSES
+
+    async def is_member(self, bot, channel: str, user_id: int, force: bool = False) -> bool:
+        """Membership of ``user_id`` in ``channel``; ``force`` skips the cached answer"""
+        try:
+            return await self._cache.get_or_load(
+                user_id, lambda: self._lookup(bot, channel, user_id), force=force
+            )
+        except TelegramAPIError as e:
+            logging.error(f"Error checking subscription for user {user_id} with channel {channel}: {e}")
+            # Enforce subscription when membership cannot be verified, but retry next time
+            return False
+
+    def invalidate(self, user_id: int):
+        self._cache.invalidate(user_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+subscription_cache = SubscriptionCache(
+    max_size=SUBSCRIPTION_CACHE_SIZE,
+    ttl=SUBSCRIPTION_CACHE_TTL,
+    negative_ttl=SUBSCRIPTION_NEGATIVE_TTL
+)
+
+
+async def check_subscription(bot, user_id: int, force: bool = False) -> bool:
+    """Check if user is subscribed to the channel (cached, ``force`` asks the Bot API)"""
+    if not ENABLE_SUBSCRIPTION_CHECK:
+        return True  # Subscription checking is disabled
+    
+    channel_identifier = get_channel_identifier()
+    if not channel_identifier:
+        return True  # If no channel identifier is set, allow access
+    
+    return await subscription_cache.is_member(bot, channel_identifier, user_id, force=force)
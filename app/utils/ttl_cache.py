@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+# Returned by TTLCache.get for keys without a live entry (None is a valid cached value)
+MISSING = object()
+
+
+class TTLCache:
+    """In-process LRU cache whose entries expire, with single-flight loading.
+
+    At most ``max_size`` entries are kept, the least recently used are
+    evicted first. ``ttl`` is either the lifetime of every entry in seconds
+    or a function of the value returning its lifetime, or ``None`` for
+    values that must not be cached (failed lookups).
+
+    ``get_or_load`` runs the loader on a miss; concurrent misses for one key
+    share a single call, and a caller that goes away does not cancel it.
+    Loader exceptions reach every waiting caller and are never cached. A
+    result loaded while ``invalidate``/``clear`` was called is returned but
+    not stored, since it may predate the write that invalidated the key.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float | Callable[[Any], float | None] = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+
+    def get(self, key: Hashable):
+        """The live cached value of ``key``, or MISSING"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value):
+        ttl = self.ttl(value) if callable(self.ttl) else self.ttl
+        if ttl is None:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable]):
+        generation = self._generation
+        value = await loader()
+        if generation == self._generation:
+            self.set(key, value)
+        return value
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable], force: bool = False):
+        """Cached value of ``key``, else the result of ``await loader()``.
+
+        ``force`` skips the cached value but still joins a load in flight.
+        """
+        if not force:
+            value = self.get(key)
+            if value is not MISSING:
+                self.hits += 1
+                return value
+        self.misses += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def invalidate(self, key: Hashable):
+        self._generation += 1
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
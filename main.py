@@ -1,21 +1,22 @@
 import asyncio
 import logging
+import sys
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.enums import ParseMode
 from app.handlers import start
 from app.handlers.admin import router as admin_router
 from app.handlers.user import router as user_router
-from app.config import BOT_TOKEN
-from app.database.models import Base
-from app.database.engine import engine
+from app.config import BOT_TOKEN, BOT_SESSION_LIMIT, BOT_SESSION_TIMEOUT, DB_SCHEMA_MODE
+from app.database.schema import prepare_schema
+from app.utils.broadcast import resume_broadcasts
+from app.utils.fsm_storage import create_fsm_storage
 
 
-async def on_startup():
-    """Create database tables on startup"""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    logging.info("Database tables created successfully")
+async def on_startup(schema_mode: str):
+    """Check or migrate the database schema on startup"""
+    await prepare_schema(schema_mode)
 
 
 async def main():
@@ -24,15 +25,22 @@ async def main():
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    # Initialize database
-    await on_startup()
+    # Initialize database ("python main.py --migrate" applies migrations first)
+    schema_mode = 'migrate' if '--migrate' in sys.argv else DB_SCHEMA_MODE
+    await on_startup(schema_mode)
     
-    # Initialize bot with default properties
+    # Initialize bot with default properties.
+    # A single pooled aiohttp session is shared by every handler (keep-alive
+    # connections to the Bot API), so handlers must use the injected bot.
+    session = AiohttpSession(limit=BOT_SESSION_LIMIT, timeout=BOT_SESSION_TIMEOUT)
     bot = Bot(
         token=BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
+    # FSM storage is chosen by FSM_STORAGE (memory, redis or postgres)
+    storage = await create_fsm_storage()
+    dp = Dispatcher(storage=storage)
     
     # Register routers
     dp.include_router(start.router)
@@ -42,9 +50,16 @@ async def main():
     # Drop pending updates to avoid flooding when bot restarts
     await bot.delete_webhook(drop_pending_updates=True)
     
+    # Continue broadcasts interrupted by the previous shutdown
+    await resume_broadcasts(bot)
+    
     # Start polling
     logging.info("Bot started successfully")
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    try:
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        await storage.close()
+        await bot.session.close()
 
 
 if __name__ == '__main__':
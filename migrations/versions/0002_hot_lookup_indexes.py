@@ -0,0 +1,44 @@
+"""indexes for hot lookup columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Collapse duplicate basket rows (possible before the constraint existed),
+    # keeping the most recent one, so the unique constraint can be created
+    op.execute(
+        sa.text(
+            "DELETE FROM basket_items a USING basket_items b "
+            "WHERE a.user_id = b.user_id AND a.product_id = b.product_id AND a.id < b.id"
+        )
+    )
+    op.create_unique_constraint('uq_basket_items_user_product', 'basket_items', ['user_id', 'product_id'])
+    op.create_index('ix_orders_user_id', 'orders', ['user_id'])
+    op.create_index('ix_orders_status_updated_at', 'orders', ['status', 'updated_at'])
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'])
+    op.create_index('ix_products_type_created_at', 'products', ['type', 'created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_type_created_at', table_name='products')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_orders_status_updated_at', table_name='orders')
+    op.drop_index('ix_orders_user_id', table_name='orders')
+    op.drop_constraint('uq_basket_items_user_product', 'basket_items', type_='unique')
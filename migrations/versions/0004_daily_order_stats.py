@@ -0,0 +1,51 @@
+"""daily order statistics rollup
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'daily_order_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('branch_id', sa.Integer(), nullable=False),
+        sa.Column('delivery_type', sa.String(length=50), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'status', 'branch_id', 'delivery_type', name='uq_daily_order_stats_bucket'),
+    )
+    # Backfill from existing orders (same grouping as rebuild_daily_order_stats)
+    op.execute(
+        sa.text(
+            "INSERT INTO daily_order_stats (day, status, branch_id, delivery_type, order_count, revenue) "
+            "SELECT date(updated_at), status, coalesce(branch_id, 0), coalesce(delivery_type, ''), "
+            "count(id), sum(total_price) FROM orders "
+            "WHERE status IN ('delivered', 'cancelled') "
+            "GROUP BY date(updated_at), status, coalesce(branch_id, 0), coalesce(delivery_type, '')"
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_order_stats')
@@ -0,0 +1,40 @@
+"""delivered_at / cancelled_at order timestamps
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 17:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('delivered_at', sa.DateTime(), nullable=True))
+    op.add_column('orders', sa.Column('cancelled_at', sa.DateTime(), nullable=True))
+    # Best available value for existing orders: the last update, which is what
+    # the statistics (and the daily_order_stats backfill) used so far
+    op.execute(sa.text("UPDATE orders SET delivered_at = updated_at WHERE status = 'delivered'"))
+    op.execute(sa.text("UPDATE orders SET cancelled_at = updated_at WHERE status = 'cancelled'"))
+    op.create_index('ix_orders_delivered_at', 'orders', ['delivered_at'])
+    op.create_index('ix_orders_cancelled_at', 'orders', ['cancelled_at'])
+    op.drop_index('ix_orders_status_updated_at', table_name='orders')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_orders_status_updated_at', 'orders', ['status', 'updated_at'])
+    op.drop_index('ix_orders_cancelled_at', table_name='orders')
+    op.drop_index('ix_orders_delivered_at', table_name='orders')
+    op.drop_column('orders', 'cancelled_at')
+    op.drop_column('orders', 'delivered_at')
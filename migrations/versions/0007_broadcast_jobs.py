@@ -0,0 +1,48 @@
+"""broadcast_jobs table
+
+Databases created with Base.metadata.create_all after broadcast jobs were
+added already have the table when they are stamped at the baseline, so it
+is only created when missing.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if sa.inspect(op.get_bind()).has_table('broadcast_jobs'):
+        return
+    op.create_table(
+        'broadcast_jobs',
+        sa.Column('admin_chat_id', sa.BigInteger(), nullable=False),
+        sa.Column('admin_message_id', sa.Integer(), nullable=True),
+        sa.Column('message_data', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('last_tg_id', sa.BigInteger(), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('sent', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('broadcast_jobs')
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+
+# app.database.engine reads DATABASE_URL on import, so point it at the test
+# database first. TEST_DATABASE_URL must be a throwaway Postgres database (its
+# tables are created and dropped by the run); without it a temporary SQLite
+# file is used and the Postgres-only tests are skipped.
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.setdefault('BOT_TOKEN', '1:test')
+
+from sqlalchemy import event, delete
+from app.database.engine import engine
+from app.database.models import Base
+from app.database.catalog import catalog
+from app.database.user_cache import user_cache
+
+IS_POSTGRES = engine.dialect.name == 'postgresql'
+# Upserts on named constraints, DELETE ... USING, FILTER aggregates
+requires_postgres = pytest.mark.skipif(not IS_POSTGRES, reason="needs TEST_DATABASE_URL (Postgres)")
+
+
+@pytest.fixture(scope='session')
+def run():
+    """Run a coroutine on the event loop shared by the whole test session"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.run_until_complete(engine.dispose())
+    loop.close()
+
+
+@pytest.fixture(scope='session')
+def database(run):
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def drop():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+
+    run(create())
+    yield
+    run(drop())
+
+
+@pytest.fixture
+def db(run, database):
+    """Empty tables and cold in-process caches for every test"""
+    async def truncate():
+        async with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                await conn.execute(delete(table))
+
+    run(truncate())
+    catalog.invalidate()
+    user_cache.clear()
+    yield
+
+
+@contextmanager
+def count_statements():
+    """Collect every SQL statement sent to the database inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def make_user(tg_id: int = 1001):
+    return SimpleNamespace(id=tg_id, username='tester', first_name='Test', last_name='User')
+
+
+def make_message(text: str = None, from_user=None):
+    """Stand-in for an aiogram Message: every reply method is an AsyncMock"""
+    message = MagicMock()
+    message.text = text
+    message.from_user = from_user or make_user()
+    message.chat.id = message.from_user.id
+    message.message_id = 1
+    message.answer = AsyncMock()
+    message.answer_photo = AsyncMock()
+    message.edit_text = AsyncMock()
+    message.delete = AsyncMock()
+    return message
+
+
+def make_callback(data: str, from_user=None):
+    """Stand-in for an aiogram CallbackQuery on a bot message"""
+    callback = MagicMock()
+    callback.data = data
+    callback.from_user = from_user or make_user()
+    callback.message = make_message(from_user=callback.from_user)
+    callback.answer = AsyncMock()
+    return callback
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from app.database.analytics_requests import get_order_heatmap, ANALYTICS_DAYS
+from app.database.engine import async_session_maker
+from app.database.models import User, Order
+
+
+def test_heatmap_buckets_orders_by_weekday_and_hour(run, db):
+    # Mondays and Sundays at fixed hours within the analytics window
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    monday = today - timedelta(days=today.weekday() + 7)
+    sunday = monday + timedelta(days=6)
+    placed_at = [
+        monday.replace(hour=9, minute=5),
+        monday.replace(hour=9, minute=55),
+        monday.replace(hour=10),
+        sunday.replace(hour=23, minute=59),
+        # Outside the window
+        today - timedelta(days=ANALYTICS_DAYS + 7),
+    ]
+
+    async def heatmap():
+        async with async_session_maker() as session:
+            user = User(tg_id=1001, first_name='Test')
+            session.add(user)
+            await session.flush()
+            session.add_all(
+                Order(user_id=user.id, total_price=Decimal('30000'), delivery_type='pickup', created_at=created_at)
+                for created_at in placed_at
+            )
+            await session.commit()
+            return await get_order_heatmap(session)
+
+    grid = run(heatmap())
+    assert grid[0][9] == 2
+    assert grid[0][10] == 1
+    assert grid[6][23] == 1
+    assert sum(map(sum, grid)) == 4
+
+
+def test_created_at_is_stamped_by_the_bot_clock(run, db):
+    async def place():
+        async with async_session_maker() as session:
+            user = User(tg_id=1001, first_name='Test')
+            session.add(user)
+            await session.commit()
+            return user.created_at
+
+    before = datetime.now()
+    created_at = run(place())
+    assert before <= created_at <= datetime.now()
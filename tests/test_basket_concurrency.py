@@ -0,0 +1,49 @@
+"""Concurrent +/- taps on one basket line (Postgres only: needs real row locks)."""
+import asyncio
+from decimal import Decimal
+import pytest
+from sqlalchemy import select
+from app.database.engine import async_session_maker
+from app.database.models import User, Product, BasketItem
+from app.database.order_requests import adjust_basket_quantity
+from tests.conftest import requires_postgres
+
+
+@requires_postgres
+@pytest.mark.parametrize('quantity, deltas, expected', [
+    # Two fast "-" taps: the second one removes the line
+    (2, (-1, -1), None),
+    # "+" then "-" on a single item: back to one
+    (1, (1, -1), 1),
+    (1, (1, 1), 3),
+])
+def test_concurrent_taps_add_up(run, db, quantity, deltas, expected):
+    async def race():
+        async with async_session_maker() as session:
+            user = User(tg_id=1001, first_name='Test')
+            product = Product(name="Mahsulot", price=Decimal('30000'), type='Nonushta')
+            session.add_all([user, product])
+            await session.flush()
+            session.add(BasketItem(user_id=user.id, product_id=product.id, quantity=quantity))
+            await session.commit()
+        line = select(BasketItem.quantity).where(BasketItem.user_id == user.id, BasketItem.product_id == product.id)
+
+        async def tap(delta: int):
+            async with async_session_maker() as session:
+                return await adjust_basket_quantity(session, user.id, product.id, delta)
+
+        # Hold the row lock so the taps start from the same snapshot and
+        # queue behind it, in the order they were made
+        async with async_session_maker() as lock:
+            await lock.execute(line.with_for_update())
+            taps = []
+            for delta in deltas:
+                taps.append(asyncio.create_task(tap(delta)))
+                await asyncio.sleep(0.1)
+            await lock.commit()
+        await asyncio.gather(*taps)
+
+        async with async_session_maker() as session:
+            return await session.scalar(line)
+
+    assert run(race()) == expected
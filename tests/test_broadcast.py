@@ -0,0 +1,168 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
+from aiogram.methods import SendMessage
+from app.database.engine import async_session_maker
+from app.database.models import User, BroadcastJob
+from app.database.broadcast_requests import create_broadcast_job, update_broadcast_progress, get_running_broadcast_jobs
+from app.utils import broadcast
+from app.utils.broadcast import TokenBucket, ChatLimiter, BroadcastEngine, broadcast_bucket
+
+real_sleep = asyncio.sleep
+
+
+class FakeClock:
+    """Replaces time.monotonic and asyncio.sleep in app.utils.broadcast: sleeping only moves the clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += max(seconds, 0)
+        await real_sleep(0)
+
+
+class FakeBot:
+    """Records send_message calls; ``errors`` maps chat_id -> exceptions to raise first"""
+
+    def __init__(self, errors: dict = None):
+        self.errors = errors or {}
+        self.sent: list[int] = []
+
+    async def send_message(self, chat_id: int, text: str):
+        errors = self.errors.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        self.sent.append(chat_id)
+
+    async def edit_message_text(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(broadcast, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(broadcast.asyncio, 'sleep', clock.sleep)
+    return clock
+
+
+def make_job(job_id: int = 1):
+    return SimpleNamespace(
+        id=job_id, message_data={'content_type': 'text', 'text': "Salom"}, admin_chat_id=1,
+        admin_message_id=None, last_tg_id=None, total=0, sent=0, failed=0
+    )
+
+
+def test_token_bucket_allows_burst_then_rate(run, clock):
+    # Rates are powers of two so the fake clock advances by exact steps
+    bucket = TokenBucket(rate=8)
+
+    async def acquire(count: int):
+        for _ in range(count):
+            await bucket.acquire()
+
+    run(acquire(8))
+    assert clock.now == 1000.0
+    run(acquire(16))
+    assert clock.now == 1002.0
+
+
+def test_concurrent_jobs_share_the_bot_wide_rate(run, clock):
+    bucket = TokenBucket(rate=8)
+
+    async def job():
+        for _ in range(12):
+            await bucket.acquire()
+
+    async def two_jobs():
+        await asyncio.gather(job(), job())
+
+    # 24 sends at 8/s with a burst of 8: two seconds, however many jobs send them
+    run(two_jobs())
+    assert clock.now == 1002.0
+
+    assert BroadcastEngine(FakeBot(), make_job(1)).bucket is broadcast_bucket
+    assert BroadcastEngine(FakeBot(), make_job(2)).bucket is broadcast_bucket
+
+
+def test_pause_blocks_every_caller(run, clock):
+    bucket = TokenBucket(rate=128)
+    bucket.pause(7)
+    run(bucket.acquire())
+    assert clock.now - 1000.0 >= 7
+
+
+def test_chat_limiter_spaces_messages_to_one_chat(run, clock):
+    limiter = ChatLimiter(interval=1)
+
+    run(limiter.wait(1))
+    run(limiter.wait(2))
+    assert clock.now == 1000.0
+
+    run(limiter.wait(1))
+    assert clock.now == 1001.0
+
+    limiter.release(1)
+    run(limiter.wait(1))
+    assert clock.now == 1001.0
+
+
+def test_retry_after_pauses_and_retries(run, clock):
+    flood = TelegramRetryAfter(SendMessage(chat_id=2, text=""), "Too Many Requests", retry_after=3)
+    bot = FakeBot(errors={2: [flood]})
+    engine = BroadcastEngine(bot, make_job(), bucket=TokenBucket(rate=128), chat_limiter=ChatLimiter(0))
+
+    async def deliver():
+        await asyncio.gather(*(engine._deliver(chat_id) for chat_id in (1, 2, 3)))
+
+    run(deliver())
+    assert sorted(bot.sent) == [1, 2, 3]
+    assert (engine.sent, engine.failed) == (3, 0)
+    assert clock.now - 1000.0 >= 3
+
+
+def test_blocked_users_count_as_failed_without_retry(run, clock):
+    blocked = TelegramForbiddenError(SendMessage(chat_id=2, text=""), "bot was blocked by the user")
+    bot = FakeBot(errors={2: [blocked]})
+    engine = BroadcastEngine(bot, make_job(), bucket=TokenBucket(rate=128), chat_limiter=ChatLimiter(0))
+
+    async def deliver():
+        await asyncio.gather(*(engine._deliver(chat_id) for chat_id in (1, 2)))
+
+    run(deliver())
+    assert bot.sent == [1]
+    assert (engine.sent, engine.failed) == (1, 1)
+
+
+def test_resumed_job_continues_after_saved_cursor(run, db, monkeypatch):
+    monkeypatch.setattr(broadcast, 'BroadcastEngine', lambda bot, job: BroadcastEngine(bot, job, batch_size=2))
+    bot = FakeBot()
+
+    async def interrupted_job():
+        async with async_session_maker() as session:
+            session.add_all(User(tg_id=tg_id, first_name=f"User {tg_id}") for tg_id in range(1, 6))
+            await session.commit()
+            job = await create_broadcast_job(session, admin_chat_id=1, message_data=make_job().message_data, total=5)
+            # The previous run finished the first batch before the restart
+            await update_broadcast_progress(session, job.id, last_tg_id=2, sent=2, failed=0)
+            return job.id
+
+    async def resume_and_finish():
+        await broadcast.resume_broadcasts(bot)
+        await asyncio.gather(*broadcast._running_tasks)
+        async with async_session_maker() as session:
+            return await session.get(BroadcastJob, job_id), await get_running_broadcast_jobs(session)
+
+    job_id = run(interrupted_job())
+    job, running = run(resume_and_finish())
+
+    assert bot.sent == [3, 4, 5]
+    assert (job.status, job.last_tg_id, job.sent, job.failed) == ('done', 5, 5, 0)
+    assert running == []
@@ -0,0 +1,61 @@
+from decimal import Decimal
+from sqlalchemy import update
+from app.database.catalog import ProductCatalog
+from app.database.engine import async_session_maker
+from app.database.models import Product
+from tests.conftest import count_statements
+
+
+def test_catalog_picks_up_edits_from_other_replicas_after_ttl(run, db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.database.catalog.time.monotonic', lambda: now[0])
+    catalog = ProductCatalog(ttl=60)
+
+    async def seed():
+        async with async_session_maker() as session:
+            session.add(Product(name="Mahsulot", price=Decimal('30000'), type='Nonushta'))
+            await session.commit()
+
+    async def rename_elsewhere():
+        # Another replica edits the product: this process is never invalidated
+        async with async_session_maker() as session:
+            await session.execute(update(Product).values(name="Yangi nom"))
+            await session.commit()
+
+    run(seed())
+    product, = run(catalog.get_all())
+    version = catalog.version
+
+    run(rename_elsewhere())
+    now[0] += 30
+    with count_statements() as statements:
+        assert run(catalog.get_by_id(product.id)).name == "Mahsulot"
+    assert statements == []
+
+    now[0] += 31
+    assert run(catalog.get_by_id(product.id)).name == "Yangi nom"
+    assert catalog.version == version + 1
+
+    # An unchanged reload keeps the version, and with it the cached keyboards
+    now[0] += 61
+    with count_statements() as statements:
+        run(catalog.get_all())
+    assert len(statements) == 1
+    assert catalog.version == version + 1
+
+
+def test_catalog_without_ttl_waits_for_invalidate(run, db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.database.catalog.time.monotonic', lambda: now[0])
+    catalog = ProductCatalog(ttl=0)
+
+    run(catalog.get_all())
+    now[0] += 10 ** 9
+    with count_statements() as statements:
+        run(catalog.get_all())
+    assert statements == []
+
+    catalog.invalidate()
+    with count_statements() as statements:
+        run(catalog.get_all())
+    assert len(statements) == 1
@@ -0,0 +1,50 @@
+import asyncio
+from app.utils.debounce import Debouncer
+
+
+def test_burst_runs_latest_callback_once(run):
+    debouncer = Debouncer(0.01)
+    calls = []
+
+    async def burst():
+        for i in range(5):
+            debouncer.schedule('key', lambda i=i: asyncio.sleep(0, calls.append(i)))
+        await debouncer.wait()
+
+    run(burst())
+    assert calls == [4]
+
+
+def test_cancel_drops_pending_call(run):
+    debouncer = Debouncer(0.01)
+    calls = []
+
+    async def cancelled():
+        debouncer.schedule('key', lambda: asyncio.sleep(0, calls.append('stale')))
+        await debouncer.cancel('key')
+        await asyncio.sleep(0.03)
+        # The key can be scheduled again afterwards
+        debouncer.schedule('key', lambda: asyncio.sleep(0, calls.append('fresh')))
+        await debouncer.wait()
+
+    run(cancelled())
+    assert calls == ['fresh']
+
+
+def test_cancel_waits_for_running_call(run):
+    debouncer = Debouncer(0)
+    events = []
+
+    async def render():
+        events.append('render started')
+        await asyncio.sleep(0.02)
+        events.append('render done')
+
+    async def take_over():
+        debouncer.schedule('key', render)
+        await asyncio.sleep(0.01)
+        await debouncer.cancel('key')
+        events.append('own edit')
+
+    run(take_over())
+    assert events == ['render started', 'render done', 'own edit']
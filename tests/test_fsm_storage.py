@@ -0,0 +1,166 @@
+import sys
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import select, update, func, text
+from app.database.engine import async_session_maker
+from app.database.models import FSMRecord
+from app.utils import fsm_storage
+from app.utils.fsm_storage import MemoryTTLStorage, PostgresStorage, create_fsm_storage
+from tests.conftest import requires_postgres
+
+
+class Checkout(StatesGroup):
+    location = State()
+    confirm = State()
+
+
+def make_key(user_id: int = 1001) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def test_memory_storage_keeps_state_and_data(run):
+    storage = MemoryTTLStorage(ttl=60)
+    key = make_key()
+
+    run(storage.set_state(key, Checkout.location))
+    run(storage.set_data(key, {'delivery_type': 'delivery'}))
+    assert run(storage.get_state(key)) == Checkout.location.state
+    assert run(storage.get_data(key)) == {'delivery_type': 'delivery'}
+
+    # state.clear(): nothing is left behind
+    run(storage.set_state(key, None))
+    run(storage.set_data(key, {}))
+    assert storage._records == {}
+
+
+def test_memory_storage_forgets_abandoned_flows(run, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.utils.fsm_storage.time.monotonic', lambda: now[0])
+    storage = MemoryTTLStorage(ttl=60)
+
+    run(storage.set_state(make_key(1), Checkout.location))
+    now[0] += 30
+    run(storage.set_state(make_key(2), Checkout.location))
+    now[0] += 40
+
+    # Expired 10 seconds ago; the other flow is still alive
+    assert run(storage.get_state(make_key(1))) is None
+    assert run(storage.get_data(make_key(1))) == {}
+    assert run(storage.get_state(make_key(2))) == Checkout.location.state
+
+    # Every write drops the expired records from the front
+    now[0] += 60
+    run(storage.set_state(make_key(3), Checkout.confirm))
+    assert list(storage._records) == [make_key(3)]
+
+
+def test_memory_storage_without_ttl_never_expires(run, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.utils.fsm_storage.time.monotonic', lambda: now[0])
+    storage = MemoryTTLStorage(ttl=None)
+
+    run(storage.set_state(make_key(), Checkout.location))
+    now[0] += 10 ** 9
+    assert run(storage.get_state(make_key())) == Checkout.location.state
+
+
+def count_records(run) -> int:
+    async def count():
+        async with async_session_maker() as session:
+            return await session.scalar(select(func.count(FSMRecord.id)))
+
+    return run(count())
+
+
+@requires_postgres
+def test_postgres_storage_upserts_one_row_per_key(run, db):
+    storage = PostgresStorage(ttl=60)
+    key = make_key()
+
+    run(storage.set_state(key, Checkout.location))
+    run(storage.set_data(key, {'delivery_type': 'delivery'}))
+    run(storage.set_state(key, Checkout.confirm))
+    assert run(storage.get_state(key)) == Checkout.confirm.state
+    assert run(storage.get_data(key)) == {'delivery_type': 'delivery'}
+    assert count_records(run) == 1
+
+    # A fresh instance (another process, a restart) sees the same flow
+    assert run(PostgresStorage(ttl=60).get_state(key)) == Checkout.confirm.state
+
+    run(storage.set_state(key, None))
+    run(storage.set_data(key, {}))
+    assert run(storage.get_state(key)) is None
+    assert count_records(run) == 0
+
+
+@requires_postgres
+def test_postgres_storage_ignores_and_resets_expired_rows(run, db):
+    storage = PostgresStorage(ttl=60)
+    key = make_key()
+    run(storage.set_state(key, Checkout.location))
+    run(storage.set_data(key, {'delivery_type': 'delivery'}))
+
+    async def expire():
+        async with async_session_maker() as session:
+            await session.execute(update(FSMRecord).values(expires_at=text("now() - interval '1 second'")))
+            await session.commit()
+
+    run(expire())
+    assert run(storage.get_state(key)) is None
+    assert run(storage.get_data(key)) == {}
+
+    # Writing the state of the expired row does not resurrect its old data
+    run(storage.set_state(key, Checkout.confirm))
+    assert run(storage.get_state(key)) == Checkout.confirm.state
+    assert run(storage.get_data(key)) == {}
+
+
+def test_create_fsm_storage_selects_backend(run):
+    assert isinstance(run(create_fsm_storage('memory')), MemoryTTLStorage)
+    assert isinstance(run(create_fsm_storage('postgres')), PostgresStorage)
+    with pytest.raises(ValueError, match="Unknown FSM_STORAGE"):
+        run(create_fsm_storage('mongo'))
+
+
+def test_redis_backend_without_package_refuses_to_start(run, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'redis.asyncio', None)
+
+    with pytest.raises(RuntimeError, match="not installed"):
+        run(create_fsm_storage('redis', fallback=False))
+    assert isinstance(run(create_fsm_storage('redis', fallback=True)), MemoryTTLStorage)
+
+
+def test_unreachable_redis_refuses_to_start_unless_fallback(run, monkeypatch):
+    pytest.importorskip('redis')
+    # Nothing listens on port 1: the connection is refused at once
+    monkeypatch.setattr(fsm_storage, 'REDIS_URL', 'redis://127.0.0.1:1/0')
+
+    with pytest.raises(RuntimeError, match="FSM_STORAGE_FALLBACK"):
+        run(create_fsm_storage('redis', fallback=False))
+    assert isinstance(run(create_fsm_storage('redis', fallback=True)), MemoryTTLStorage)
+
+
+def test_reachable_redis_is_used(run, monkeypatch):
+    pytest.importorskip('redis')
+    from redis.asyncio import Redis
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    async def ping(self, **kwargs):
+        return True
+
+    monkeypatch.setattr(Redis, 'ping', ping)
+    storage = run(create_fsm_storage('redis', fallback=False))
+    assert isinstance(storage, RedisStorage)
+    run(storage.close())
+
+
+def test_redis_storage_round_trip(run):
+    fakeredis = pytest.importorskip('fakeredis')
+    storage = fsm_storage.build_redis_storage(fakeredis.FakeAsyncRedis(), ttl=60)
+    key = make_key()
+
+    run(storage.set_state(key, Checkout.location))
+    run(storage.set_data(key, {'delivery_type': 'pickup'}))
+    assert run(storage.get_state(key)) == Checkout.location.state
+    assert run(storage.get_data(key)) == {'delivery_type': 'pickup'}
@@ -0,0 +1,72 @@
+import asyncio
+from geopy.exc import GeocoderTimedOut
+from app.utils.geocoding import GeocodingService, StubBackend, ADDRESS_NOT_FOUND, ADDRESS_TIMEOUT
+
+
+class FailingBackend(StubBackend):
+    """Raises ``error`` on every lookup"""
+
+    def __init__(self, error: Exception):
+        super().__init__()
+        self.error = error
+
+    async def reverse(self, latitude: float, longitude: float) -> str:
+        self.calls += 1
+        raise self.error
+
+
+def test_nearby_coordinates_share_a_cache_entry(run):
+    backend = StubBackend()
+    service = GeocodingService(backend, precision=3)
+
+    first = run(service.reverse(38.27314, 67.89861))
+    second = run(service.reverse(38.27336, 67.89854))
+    # The backend is asked for the rounded key, not the raw coordinates
+    assert first == second == "38.273, 67.899"
+    assert backend.calls == 1
+
+    run(service.reverse(38.27414, 67.89861))
+    assert backend.calls == 2
+
+
+def test_repeat_lookups_are_served_from_cache(run):
+    backend = StubBackend("Denov, Sharof Rashidov ko'chasi")
+    service = GeocodingService(backend)
+
+    for _ in range(3):
+        assert run(service.reverse(38.2731, 67.8986)) == "Denov, Sharof Rashidov ko'chasi"
+    assert backend.calls == 1
+
+
+def test_concurrent_lookups_share_one_backend_call(run):
+    backend = StubBackend()
+    service = GeocodingService(backend)
+
+    async def burst():
+        return await asyncio.gather(*(service.reverse(38.2731, 67.8986) for _ in range(5)))
+
+    assert len(set(run(burst()))) == 1
+    assert backend.calls == 1
+
+
+def test_address_not_found_is_not_cached(run):
+    backend = StubBackend(ADDRESS_NOT_FOUND)
+    service = GeocodingService(backend)
+
+    assert run(service.reverse(38.2731, 67.8986)) == ADDRESS_NOT_FOUND
+    assert run(service.reverse(38.2731, 67.8986)) == ADDRESS_NOT_FOUND
+    assert backend.calls == 2
+
+
+def test_failures_are_not_cached(run):
+    service = GeocodingService(FailingBackend(GeocoderTimedOut()))
+    assert run(service.reverse(38.2731, 67.8986)) == ADDRESS_TIMEOUT
+
+    service.set_backend(FailingBackend(ConnectionError("network down")))
+    assert run(service.reverse(38.2731, 67.8986)) == ADDRESS_NOT_FOUND
+
+    backend = StubBackend("Denov")
+    service.set_backend(backend)
+    assert run(service.reverse(38.2731, 67.8986)) == "Denov"
+    assert run(service.reverse(38.2731, 67.8986)) == "Denov"
+    assert backend.calls == 1
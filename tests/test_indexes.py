@@ -0,0 +1,47 @@
+"""The hot lookups are served by their indexes (EXPLAIN, Postgres only).
+
+The test tables are nearly empty, so sequential scans are disabled for the
+transaction: the planner then uses an index whenever one can serve the
+query, and the plan names it.
+"""
+import pytest
+from sqlalchemy import select, func, text
+from app.database.engine import engine
+from app.database.models import User, Product, BasketItem, Order, OrderItem
+from tests.conftest import requires_postgres
+
+HOT_LOOKUPS = {
+    # get_user_by_tg_id / user_cache
+    'users_tg_id_key': select(User.id).where(User.tg_id == 1001),
+    # get_basket_view / adjust_basket_quantity
+    'uq_basket_items_user_product': select(BasketItem.quantity).where(BasketItem.user_id == 1),
+    # get_user_orders
+    'ix_orders_user_id': select(Order.id).where(Order.user_id == 1),
+    # get_order_items
+    'ix_order_items_order_id': select(OrderItem.product_name).where(OrderItem.order_id == 1),
+    # get_products_by_type
+    'ix_products_type_created_at': select(Product.id).where(Product.type == 'Nonushta').order_by(Product.created_at),
+    # statistics ranges over the status timestamps
+    'ix_orders_delivered_at': select(func.count()).where(Order.delivered_at >= text("now() - interval '7 days'")),
+    # analytics heatmap
+    'ix_orders_created_at': select(func.count()).where(Order.created_at >= text("now() - interval '30 days'")),
+}
+
+
+def explain(run, stmt) -> str:
+    sql = stmt.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+
+    async def plan():
+        async with engine.begin() as conn:
+            await conn.execute(text("SET LOCAL enable_seqscan = off"))
+            result = await conn.execute(text(f"EXPLAIN {sql}"))
+            return "\n".join(row[0] for row in result)
+
+    return run(plan())
+
+
+@requires_postgres
+@pytest.mark.parametrize('index', HOT_LOOKUPS)
+def test_hot_lookup_uses_index(run, db, index):
+    plan = explain(run, HOT_LOOKUPS[index])
+    assert index in plan, plan
@@ -0,0 +1,200 @@
+"""SQL statements issued per handler.
+
+Every relationship is lazy="raise" and each query declares its own loads,
+so the statement count of a handler only changes when its queries do. These
+tests pin the counts: a handler that starts issuing an extra query (a lookup
+in a loop, a reload after commit) fails here instead of in production.
+"""
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+from app.database.engine import async_session_maker
+from app.database.models import User, Product, Branch, BasketItem, Order
+from app.database.user_cache import user_cache
+from app.middlewares.user_context import UserContextMiddleware
+from tests.conftest import count_statements, make_callback, make_message, make_user, requires_postgres
+
+
+def seed(run, *rows):
+    async def add():
+        async with async_session_maker() as session:
+            for row in rows:
+                session.add(row)
+                await session.flush()
+            await session.commit()
+
+    run(add())
+    return rows
+
+
+def seed_customer(run, tg_id: int = 1001, basket_size: int = 0):
+    """A registered user with ``basket_size`` products in the basket; returns their UserContext"""
+    user, = seed(run, User(tg_id=tg_id, first_name='Test', full_name='Test User', phone_number='+998 90 123 4567'))
+    products = seed(run, *(
+        Product(name=f"Mahsulot {i}", price=Decimal('45000.00'), type='Nonushta', description="Tavsif")
+        for i in range(basket_size)
+    ))
+    seed(run, *(BasketItem(user_id=user.id, product_id=product.id, quantity=2) for product in products))
+    return run(user_cache.get(tg_id))
+
+
+def test_user_context_middleware_queries_once_per_user(run, db):
+    seed_customer(run)
+    user_cache.clear()
+    middleware = UserContextMiddleware()
+    handler = AsyncMock()
+
+    with count_statements() as statements:
+        run(middleware(handler, MagicMock(), {'event_from_user': make_user()}))
+    assert len(statements) == 1
+
+    # Cached: the next update of the same user needs no query
+    with count_statements() as statements:
+        run(middleware(handler, MagicMock(), {'event_from_user': make_user()}))
+    assert len(statements) == 0
+    assert handler.await_args.args[1]['current_user'].tg_id == 1001
+
+
+def test_user_context_middleware_skips_handlers_without_current_user(run, db):
+    from aiogram.dispatcher.event.handler import HandlerObject
+    from app.handlers.user.orders import my_orders
+    from app.handlers.user.products import show_category_products
+
+    seed_customer(run)
+    user_cache.clear()
+    middleware = UserContextMiddleware()
+
+    with count_statements() as statements:
+        run(middleware(AsyncMock(), MagicMock(), {
+            'event_from_user': make_user(), 'handler': HandlerObject(show_category_products)
+        }))
+    assert len(statements) == 0
+
+    with count_statements() as statements:
+        run(middleware(AsyncMock(), MagicMock(), {
+            'event_from_user': make_user(), 'handler': HandlerObject(my_orders)
+        }))
+    assert len(statements) == 1
+
+
+def test_start_registers_user_in_one_statement(run, db):
+    from app.handlers.start import cmd_start
+
+    with count_statements() as statements:
+        run(cmd_start(make_message('/start')))
+    assert len(statements) == 1
+
+
+def test_category_products_load_catalog_once(run, db):
+    from app.handlers.user.products import show_category_products
+
+    seed(run, *(Product(name=f"Mahsulot {i}", price=Decimal('30000'), type='Nonushta') for i in range(10)))
+
+    with count_statements() as statements:
+        run(show_category_products(make_callback('category_nonushta')))
+    assert len(statements) == 1
+
+    # Later taps are served from the in-process catalog
+    with count_statements() as statements:
+        run(show_category_products(make_callback('category_nonushta')))
+        run(show_category_products(make_callback('category_detox')))
+    assert len(statements) == 0
+
+
+def test_my_orders_renders_basket_in_one_statement(run, db):
+    from app.handlers.user.orders import my_orders
+
+    current_user = seed_customer(run, basket_size=5)
+    message = make_message("📦 Mening buyurtmalarim")
+
+    with count_statements() as statements:
+        run(my_orders(message, current_user))
+    assert len(statements) == 1
+    assert "Mahsulot 4" in message.answer.await_args.args[0]
+
+
+def test_pickup_branches_in_one_statement(run, db):
+    from app.handlers.user.orders import order_pickup_show_branches
+
+    seed(run, *(Branch(name=f"Filial {i}", location="Denov") for i in range(3)))
+
+    with count_statements() as statements:
+        run(order_pickup_show_branches(make_callback('order_pickup')))
+    assert len(statements) == 1
+
+
+def test_basket_tap_updates_and_renders_once(run, db, monkeypatch):
+    from app.handlers.user import orders
+
+    current_user = seed_customer(run, basket_size=3)
+    monkeypatch.setattr(orders.basket_render_debouncer, 'delay', 0)
+    callback = make_callback('basket_inc_1_2')
+
+    with count_statements() as statements:
+        run(orders.basket_increase(callback, current_user))
+        run(orders.basket_render_debouncer.wait())
+    # UPDATE ... RETURNING, then the debounced re-render
+    assert len(statements) == 2
+    callback.message.edit_text.assert_awaited_once()
+
+
+def test_basket_tap_removing_line(run, db, monkeypatch):
+    from app.handlers.user import orders
+
+    current_user = seed_customer(run, basket_size=1)
+    # Long enough for both taps to land in one render window
+    monkeypatch.setattr(orders.basket_render_debouncer, 'delay', 0.2)
+
+    async def tap_twice():
+        for _ in range(2):
+            await orders.basket_decrease(make_callback('basket_dec_1_2'), current_user)
+        await orders.basket_render_debouncer.wait()
+
+    with count_statements() as statements:
+        run(tap_twice())
+    # One UPDATE per tap, a DELETE once the line reaches zero, one re-render
+    assert len(statements) == 4
+
+
+@requires_postgres
+def test_save_to_basket_in_one_statement(run, db):
+    from app.handlers.user.basket import save_to_basket
+    from app.database.catalog import catalog
+
+    current_user = seed_customer(run, basket_size=1)
+    run(catalog.get_by_id(1))
+
+    with count_statements() as statements:
+        run(save_to_basket(make_callback('save_basket_1_3'), current_user))
+    assert len(statements) == 1
+
+
+@requires_postgres
+def test_pickup_order_statements_do_not_grow_with_basket(run, db):
+    from app.handlers.user.orders import confirm_order_yes_pickup
+
+    current_user = seed_customer(run, basket_size=8)
+    branch, = seed(run, Branch(name="Filial", location="Denov"))
+    state = AsyncMock()
+    state.get_data.return_value = {'branch_id': branch.id}
+    bot = AsyncMock()
+    bot.send_message.return_value = MagicMock(message_id=42)
+
+    with count_statements() as statements:
+        run(confirm_order_yes_pickup(make_callback('confirm_order_yes_pickup'), state, bot, current_user))
+    # Branch, DELETE ... RETURNING basket, INSERT order, INSERT items, UPDATE group_message_id
+    assert len(statements) == 5
+
+
+@requires_postgres
+def test_order_status_update_statements(run, db):
+    from app.handlers.user.orders import update_order_status_handler
+
+    current_user = seed_customer(run)
+    branch, = seed(run, Branch(name="Filial", location="Denov"))
+    order, = seed(run, Order(user_id=current_user.id, total_price=Decimal('90000'), delivery_type='pickup', branch_id=branch.id))
+    bot = AsyncMock()
+
+    with count_statements() as statements:
+        run(update_order_status_handler(make_callback(f'order_status_{order.id}_delivered'), bot))
+    # Locked order with branch, rollup upsert, UPDATE, refresh, items, user
+    assert len(statements) == 6
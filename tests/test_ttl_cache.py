@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from app.utils.ttl_cache import TTLCache, MISSING
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is MISSING
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_entries_expire_and_ttl_can_depend_on_value(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.utils.ttl_cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(ttl=lambda value: None if value is False else (60 if value else 5))
+    cache.set('member', True)
+    cache.set('not_member', 0)
+    cache.set('unknown', False)
+
+    now[0] += 10
+    assert cache.get('member') is True
+    assert cache.get('not_member') is MISSING
+    assert cache.get('unknown') is MISSING
+
+
+def test_concurrent_misses_share_one_load(run):
+    cache = TTLCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return None
+
+    async def burst():
+        return await asyncio.gather(*(cache.get_or_load('key', loader) for _ in range(5)))
+
+    assert run(burst()) == [None] * 5
+    assert run(cache.get_or_load('key', loader)) is None
+    assert len(calls) == 1
+    assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 5}
+
+
+def test_failed_load_is_not_cached(run):
+    cache = TTLCache()
+
+    async def failing():
+        raise RuntimeError("backend down")
+
+    async def working():
+        return 'ok'
+
+    with pytest.raises(RuntimeError):
+        run(cache.get_or_load('key', failing))
+    assert run(cache.get_or_load('key', working)) == 'ok'
+
+
+def test_load_racing_with_invalidate_is_not_stored(run):
+    cache = TTLCache()
+
+    async def loader():
+        cache.invalidate('key')
+        return 'stale'
+
+    assert run(cache.get_or_load('key', loader)) == 'stale'
+    assert cache.get('key') is MISSING